@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+"""
+Micro benchmark of the JigsawView per request overhead.
+
+Compares views with 1, 5 and 20 pieces using the precomputed execution plan
+against the previous implementation which looked the pieces up by name on
+every request. The baseline is a standalone copy of the original view and
+pieces, so it doesn't include any of the current code. No database nor
+template rendering is involved.
+
+Usage: python benchmarks/pieces_overhead.py [--number N]
+"""
+from __future__ import print_function, unicode_literals
+
+import copy
+import sys
+import timeit
+from os.path import dirname, abspath
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DATABASES={
+            'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }},
+        INSTALLED_APPS=['jigsawview'],
+        ROOT_URLCONF='',
+        DEBUG=False,
+    )
+
+from functools import update_wrapper
+
+from django.template.response import TemplateResponse
+from django.test import RequestFactory
+from django.utils.decorators import classonlymethod
+
+import six
+
+from jigsawview import JigsawView
+from jigsawview.pieces import Piece
+from jigsawview.utils import OrderedDict
+
+
+class CounterPiece(Piece):
+    template_name_prefix = 'counter'
+
+    def get_context_data(self, context, *args, **kwargs):
+        context[self.view_name] = self.mode
+        return context
+
+
+# The pieces and the view as they were before the execution plan. They're
+# reproduced here rather than subclassed so that the baseline doesn't pay
+# for the current binding, state and instrumentation code.
+
+class LegacyUnboundPiece(object):
+
+    def __init__(self, cls, **kwargs):
+        self.cls = cls
+        self.cls_kwargs = copy.copy(kwargs)
+        self.creation_counter = LegacyPiece.creation_counter
+        LegacyPiece.creation_counter += 1
+
+    def __call__(self, **instance_kwargs):
+        kwargs = copy.copy(self.cls_kwargs)
+        kwargs.update(instance_kwargs)
+        kwargs['creation_counter'] = self.creation_counter
+        return self.cls(bound=True, **kwargs)
+
+
+class LegacyPiece(object):
+    creation_counter = 0
+    view_name = None
+    template_name = None
+    template_name_prefix = None
+    mode = None
+    view_mode = None
+    default_mode = None
+    inherited_piece = False
+
+    def __new__(cls, **kwargs):
+        bound = kwargs.pop('bound', False)
+        if not bound:
+            return LegacyUnboundPiece(cls, **kwargs)
+        return super(LegacyPiece, cls).__new__(cls)
+
+    def __init__(self, *args, **kwargs):
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+        self.mode = self.mode or \
+            (self.inherited_piece and self.default_mode) or \
+            self.view_mode
+
+    def add_kwargs(self, **kwargs):
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+
+    def get_template_name(self, *args, **kwargs):
+        if self.template_name:
+            return '%s' % self.template_name
+        if self.template_name_prefix:
+            return '%s_%s' % (self.template_name_prefix, self.mode)
+        return None
+
+    def get_context_data(self, context, *args, **kwargs):
+        return context
+
+    def dispatch(self, context):
+        return
+
+
+class LegacyCounterPiece(LegacyPiece):
+    template_name_prefix = 'counter'
+
+    def get_context_data(self, context, *args, **kwargs):
+        context[self.view_name] = self.mode
+        return context
+
+
+class LegacyViewMetaclass(type):
+
+    def __new__(cls, name, bases, attrs):
+        original_attrs = copy.copy(attrs)
+        pieces = [(piece_name, attrs.pop(piece_name))
+            for piece_name, obj in list(attrs.items())
+            if isinstance(obj, LegacyUnboundPiece)]
+        pieces.sort(key=lambda x: x[1].creation_counter)
+        for base in bases[::-1]:
+            if hasattr(base, 'base_pieces'):
+                pieces = list(base.base_pieces.items()) + pieces
+        attrs['pieces'] = OrderedDict(pieces)
+        attrs['base_pieces'] = OrderedDict([(k, v)
+            for k, v in attrs['pieces'].items() if k in original_attrs])
+        return super(LegacyViewMetaclass, cls).__new__(cls, name, bases, attrs)
+
+
+class LegacyJigsawView(six.with_metaclass(LegacyViewMetaclass, object)):
+    mode = None
+    template_name = None
+    template_name_prefix = None
+
+    def __init__(self, **kwargs):
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+        mode = kwargs['mode']
+        for name, unbound_piece in self.pieces.items():
+            piece = unbound_piece(
+                view_mode=mode,
+                inherited_piece=(name not in self.base_pieces),
+                view_name=name,
+                view=self)
+            setattr(self, name, piece)
+        self.context = {}
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        def view(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            return self.dispatch(request, *args, **kwargs)
+        update_wrapper(view, cls, updated=())
+        return view
+
+    def get_template_name(self):
+        if self.template_name:
+            return '%s' % self.template_name
+        if self.template_name_prefix:
+            return '%s%s.html' % (self.template_name_prefix, self.mode)
+        for piece_name in reversed(list(self.pieces.keys())):
+            piece = getattr(self, piece_name)
+            result = piece.get_template_name()
+            if result:
+                return '%s.html' % result
+        return None
+
+    def get_context_data(self, request, **kwargs):
+        for piece_name in self.pieces.keys():
+            piece = getattr(self, piece_name)
+            self.context = piece.get_context_data(self.context, **kwargs)
+        return self.context
+
+    def render_to_response(self, request, context, **response_kwargs):
+        return TemplateResponse(
+            request=request,
+            template=self.get_template_name(),
+            context=context,
+            **response_kwargs
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        for piece_name in reversed(list(self.pieces.keys())):
+            piece = getattr(self, piece_name)
+            piece.add_kwargs(**kwargs)
+            piece.add_kwargs(request=request)
+        context = self.get_context_data(request, **kwargs)
+        for piece_name in reversed(list(self.pieces.keys())):
+            piece = getattr(self, piece_name)
+            result = piece.dispatch(context)
+            if result:
+                return result
+        return self.render_to_response(request, context)
+
+
+def make_view(base, piece_class, count):
+    attrs = dict(('piece%i' % i, piece_class()) for i in range(count))
+    return type(str('%sView%i' % (base.__name__, count)), (base,), attrs)
+
+
+def measure_request(view_class, request, number, repeat):
+    """
+    Full request: view instanciation, pieces binding and pipeline.
+    """
+    view = view_class.as_view(mode='detail')
+    timer = timeit.Timer(lambda: view(request, pk='1'))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def measure_pipeline(view_class, request, number, repeat):
+    """
+    Pipeline only: dispatch on an already bound view.
+    """
+    view = view_class(mode='detail')
+    timer = timeit.Timer(lambda: view.dispatch(request, pk='1'))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main(number=2000, repeat=7):
+    request = RequestFactory().get('/')
+    for title, measure in (('full request', measure_request),
+                           ('pipeline only', measure_pipeline)):
+        print(title)
+        print('%8s %14s %14s %8s' % (
+            'pieces', 'before (us)', 'after (us)', 'gain'))
+        for count in (1, 5, 20):
+            before = measure(
+                make_view(LegacyJigsawView, LegacyCounterPiece, count),
+                request, number, repeat)
+            after = measure(make_view(JigsawView, CounterPiece, count),
+                request, number, repeat)
+            print('%8i %14.2f %14.2f %7.1f%%' % (count,
+                before * 1e6, after * 1e6, 100.0 * (before - after) / before))
+        print('')
+
+
+if __name__ == '__main__':
+    number = 2000
+    if '--number' in sys.argv:
+        number = int(sys.argv[sys.argv.index('--number') + 1])
+    main(number)
@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+"""
+Benchmark suite of the JigsawView request pipeline.
+
+Runs a set of scenarios against an in-memory SQLite database and, when an
+equivalent exists, against Django's generic class based views:
+
+- object detail, update (GET and POST) with the ObjectPiece,
+- paginated and filtered lists,
+- objects with inline formsets,
+- deep view inheritance with a chain of parent objects.
+
+For each scenario and implementation, it reports the requests per second,
+the latency percentiles, the per phase latency percentiles of the pieces
+(add_kwargs, context, dispatch, render), the number of queries and, on
+Python 3, the peak memory allocated by a request.
+
+Usage:
+
+    python benchmarks/pipeline.py [--rows N] [--requests N]
+        [--output results.json] [--compare previous.json]
+        [--scenario name ...]
+
+--output stores the results as JSON so that they can be compared with
+--compare against the results of another commit.
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import time
+from os.path import dirname, abspath, join
+
+ROOT = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DATABASES={
+            'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }},
+        INSTALLED_APPS=[
+            'django.contrib.contenttypes',
+            'django.contrib.auth',
+            'jigsawview',
+            'jigsawview.tests',
+        ],
+        TEMPLATE_DIRS=[join(ROOT, 'benchmarks', 'templates')],
+        TEMPLATES=[{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [join(ROOT, 'benchmarks', 'templates')],
+            'APP_DIRS': True,
+        }],
+        ROOT_URLCONF='jigsawview.tests.urls',
+        DEBUG=False,
+    )
+
+import django
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+from django.core.management import call_command
+from django.test import RequestFactory
+from django.views.generic import DetailView, ListView, UpdateView
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from jigsawview import JigsawView
+from jigsawview.pieces import ObjectPiece
+from jigsawview.instrumentation import QueryCounter, request_measured
+from jigsawview.tests.models import MyObjectModel, MyInlineModel
+from jigsawview.tests.views import MyObjectPiece, MyRootPiece, FilterPiece
+
+
+timer = getattr(time, 'perf_counter', time.time)
+
+PHASES = ('add_kwargs', 'context', 'dispatch', 'render')
+
+
+#
+# Views
+#
+
+class DetailJigsawView(JigsawView):
+    template_name = 'bench/detail.html'
+    obj = MyObjectPiece()
+
+
+class PaginatedJigsawView(JigsawView):
+    template_name = 'bench/list.html'
+    obj = MyObjectPiece(paginate_by=20)
+
+
+class FilteredJigsawView(JigsawView):
+    template_name = 'bench/list.html'
+    obj = FilterPiece(paginate_by=20)
+
+
+class UpdateJigsawView(JigsawView):
+    template_name = 'bench/form.html'
+    obj = MyObjectPiece(fields=('slug', 'other_slug_field'))
+
+
+class InlineJigsawView(JigsawView):
+    template_name = 'bench/form.html'
+    obj = MyRootPiece()
+
+
+class ChainRootView(JigsawView):
+    template_name = 'bench/chain.html'
+    obj = MyObjectPiece(default_mode='detail')
+
+
+class ChainView(ChainRootView):
+    inline = ObjectPiece(model=MyInlineModel, pk_url_kwarg='inline_pk',
+        parent='obj', parent_field='root_obj')
+
+
+class DeepChainView(ChainView):
+    others = ObjectPiece(model=MyInlineModel, mode='list', paginate_by=5,
+        parent='obj', parent_field='root_obj')
+
+
+class ObjectDetailView(DetailView):
+    model = MyObjectModel
+    template_name = 'bench/detail.html'
+
+
+class ObjectListView(ListView):
+    model = MyObjectModel
+    paginate_by = 20
+    template_name = 'bench/list.html'
+
+
+class FilteredObjectListView(ObjectListView):
+
+    def get_queryset(self):
+        queryset = super(FilteredObjectListView, self).get_queryset()
+        slug = self.request.GET.get('slug')
+        if slug:
+            queryset = queryset.filter(slug=slug)
+        return queryset
+
+
+class ObjectUpdateView(UpdateView):
+    model = MyObjectModel
+    template_name = 'bench/form.html'
+    fields = ('slug', 'other_slug_field')
+
+
+#
+# Scenarios
+#
+
+UPDATE_DATA = {'slug': 'object_1', 'other_slug_field': 'other_1'}
+
+INLINE_DATA = {
+    'slug': 'object_1',
+    'other_slug_field': 'other_1',
+    'obj_data-TOTAL_FORMS': '1',
+    'obj_data-INITIAL_FORMS': '0',
+    'obj_data-MAX_NUM_FORMS': '1000',
+    'obj_data-0-my_data': 'data',
+}
+
+# name: (jigsawview, django baseline, mode, method, path, kwargs, data)
+SCENARIOS = (
+    ('detail', DetailJigsawView, ObjectDetailView, 'detail', 'get', '/',
+        {'pk': 1}, None),
+    ('list_paginated', PaginatedJigsawView, ObjectListView, 'list', 'get',
+        '/?page=2', {}, None),
+    ('list_filtered', FilteredJigsawView, FilteredObjectListView, 'list',
+        'get', '/?slug=object_5', {}, None),
+    ('update_get', UpdateJigsawView, ObjectUpdateView, 'update', 'get', '/',
+        {'pk': 1}, None),
+    ('update_post', UpdateJigsawView, ObjectUpdateView, 'update', 'post',
+        '/', {'pk': 1}, UPDATE_DATA),
+    ('inline_update_get', InlineJigsawView, None, 'update', 'get', '/',
+        {'pk': 1}, None),
+    ('inline_update_post', InlineJigsawView, None, 'update', 'post', '/',
+        {'pk': 1}, INLINE_DATA),
+    ('deep_chain_detail', DeepChainView, None, 'detail', 'get', '/',
+        {'pk': 1, 'inline_pk': 1}, None),
+)
+
+
+def create_data(rows):
+    if django.VERSION >= (1, 7):
+        call_command('migrate', run_syncdb=True, verbosity=0)
+    else:
+        call_command('syncdb', interactive=False, verbosity=0)
+    for i in range(1, rows + 1):
+        obj = MyObjectModel.objects.create(slug='object_%i' % i,
+            other_slug_field='other_%i' % i)
+        for j in range(5):
+            MyInlineModel.objects.create(root_obj=obj, my_data='data_%i' % j)
+
+
+def make_view(view_class, mode, instrument=False):
+    if view_class is None:
+        return None
+    if issubclass(view_class, JigsawView):
+        if instrument:
+            view_class = type(str('Instrumented%s' % view_class.__name__),
+                (view_class,), {'instrument': True})
+        return view_class.as_view(mode=mode)
+    return view_class.as_view()
+
+
+def run_request(view, request, kwargs):
+    response = view(request, **kwargs)
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    return response
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def get(p):
+        return values[int(round(p / 100.0 * (len(values) - 1)))] * 1000
+
+    return {'p50': get(50), 'p90': get(90), 'p99': get(99)}
+
+
+def measure(view_class, mode, method, path, kwargs, data, requests):
+    """
+    Returns the results of a scenario for a view class.
+    """
+    factory = RequestFactory()
+
+    def make_request():
+        if method == 'post':
+            return factory.post(path, data)
+        return factory.get(path)
+
+    view = make_view(view_class, mode)
+    # Warm up the caches and check the scenario works
+    response = run_request(view, make_request(), kwargs)
+    if response.status_code not in (200, 302):
+        raise RuntimeError('%s returned %s' % (view_class.__name__,
+            response.status_code))
+
+    requests_list = [make_request() for i in range(requests)]
+    latencies = []
+    start = timer()
+    for request in requests_list:
+        request_start = timer()
+        run_request(view, request, kwargs)
+        latencies.append(timer() - request_start)
+    total = timer() - start
+
+    counter = QueryCounter()
+    with counter:
+        run_request(view, make_request(), kwargs)
+
+    result = {
+        'requests_per_second': requests / total,
+        'latency_ms': percentiles(latencies),
+        'queries': counter.queries,
+        'phases_ms': None,
+        'peak_memory_kb': None,
+    }
+
+    if issubclass(view_class, JigsawView):
+        result['phases_ms'] = measure_phases(view_class, mode, make_request,
+            kwargs, requests)
+
+    if tracemalloc is not None:
+        peaks = []
+        tracemalloc.start()
+        try:
+            for i in range(min(requests, 50)):
+                request = make_request()
+                tracemalloc.clear_traces()
+                run_request(view, request, kwargs)
+                peaks.append(tracemalloc.get_traced_memory()[1] / 1024.0)
+        finally:
+            tracemalloc.stop()
+        result['peak_memory_kb'] = sorted(peaks)[len(peaks) // 2]
+    return result
+
+
+def measure_phases(view_class, mode, make_request, kwargs, requests):
+    """
+    Returns the latency percentiles of each phase, summed over the pieces.
+    """
+    view = make_view(view_class, mode, instrument=True)
+    durations = dict((phase, []) for phase in PHASES)
+
+    def receiver(sender, measures, **extra):
+        totals = dict((phase, 0.0) for phase in PHASES)
+        for measure in measures:
+            totals[measure.phase] += measure.duration
+        for phase in PHASES:
+            durations[phase].append(totals[phase])
+
+    request_measured.connect(receiver)
+    try:
+        for i in range(requests):
+            run_request(view, make_request(), kwargs)
+    finally:
+        request_measured.disconnect(receiver)
+    return dict((phase, percentiles(durations[phase])) for phase in PHASES)
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+            cwd=ROOT, stderr=subprocess.STDOUT).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(rows, requests, names=None):
+    create_data(rows)
+    results = {
+        'meta': {
+            'date': datetime.datetime.utcnow().isoformat(),
+            'commit': get_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'rows': rows,
+            'requests': requests,
+        },
+        'scenarios': {},
+    }
+    for scenario in SCENARIOS:
+        name, jigsaw_view, django_view, mode, method, path, kwargs, data = \
+            scenario
+        if names and name not in names:
+            continue
+        results['scenarios'][name] = {
+            'jigsawview': measure(jigsaw_view, mode, method, path, kwargs,
+                data, requests),
+            'django': django_view and measure(django_view, mode, method,
+                path, kwargs, data, requests),
+        }
+    return results
+
+
+def print_results(results):
+    print('%-20s %-11s %9s %9s %9s %8s %10s' % ('scenario', 'views',
+        'req/s', 'p50 ms', 'p99 ms', 'queries', 'peak kB'))
+    for name, scenario in sorted(results['scenarios'].items()):
+        for kind in ('jigsawview', 'django'):
+            result = scenario[kind]
+            if result is None:
+                continue
+            print('%-20s %-11s %9.1f %9.3f %9.3f %8i %10s' % (name, kind,
+                result['requests_per_second'], result['latency_ms']['p50'],
+                result['latency_ms']['p99'], result['queries'],
+                result['peak_memory_kb'] is not None and
+                    '%.1f' % result['peak_memory_kb'] or '-'))
+        phases = scenario['jigsawview']['phases_ms']
+        print('%-20s %-11s %s' % ('', 'phases p50', ', '.join(
+            '%s %.3f' % (phase, phases[phase]['p50']) for phase in PHASES)))
+
+
+def print_comparison(previous, results):
+    """
+    Prints the changes between two runs of the JigsawView scenarios.
+    """
+    print('')
+    print('Compared to %s' % (previous['meta'].get('commit') or 'previous'))
+    print('%-20s %12s %12s %10s' % ('scenario', 'req/s', 'p50', 'queries'))
+    for name, scenario in sorted(results['scenarios'].items()):
+        if name not in previous['scenarios']:
+            continue
+        before = previous['scenarios'][name]['jigsawview']
+        after = scenario['jigsawview']
+        print('%-20s %+11.1f%% %+11.1f%% %+10i' % (name,
+            100.0 * (after['requests_per_second'] /
+                before['requests_per_second'] - 1),
+            100.0 * (after['latency_ms']['p50'] /
+                before['latency_ms']['p50'] - 1),
+            after['queries'] - before['queries']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    parser.add_argument('--scenario', action='append')
+    args = parser.parse_args(argv)
+
+    results = run(args.rows, args.requests, args.scenario)
+    print_results(results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
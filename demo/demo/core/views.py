@@ -22,29 +22,24 @@ class ProjectMixin(ObjectPiece):
 class MilestoneMixin(ObjectPiece):
     model = Milestone
     pk_url_kwarg = 'milestone_id'
+    # Limits the milestones to the current project's ones
+    parent = 'project'
+    parent_field = 'project'
 
     def get_success_url(self):
         return reverse('milestones')
 
-    def get_queryset(self):
-        return Milestone.objects.filter(project=self.view.context['project'])
-
 
 class BugMixin(ObjectPiece):
     model = Bug
     pk_url_kwarg = 'bug_id'
+    # Limits the bugs to the current project's ones
+    parent = 'project'
+    parent_field = 'project'
 
     def get_success_url(self, obj=None):
         return reverse('bugs', kwargs={'project_id': obj.project.id})
 
-    def get_queryset(self):
-        # Limits the bugs to the current project's ones
-        # and possibly the milestone if we have one
-        qs = Bug.objects.filter(project=self.view.context['project'])
-        if 'milestone' in self.view.context:
-            qs = qs.filter(milestone=self.view.context['milestone'])
-        return qs
-
 
 class ProjectView(JigsawView):
     project = ProjectMixin(default_mode='detail')
@@ -60,4 +55,6 @@ class BugView(ProjectView):
 
 
 class BugMilestoneView(MilestoneView):
-    bug = BugMixin(default_mode='detail')
+    # The bug, its milestone and project are fetched with a single query
+    bug = BugMixin(default_mode='detail', parent='milestone',
+        parent_field='milestone')
@@ -0,0 +1,250 @@
+"""
+Asynchronous Jigsaw view and pieces.
+
+This module requires Python 3.6+, Django 3.1+ for the asynchronous views and
+Django 4.1+ for the asynchronous ORM used by AsyncObjectPiece. It isn't
+imported by the jigsawview package.
+"""
+
+import asyncio
+
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import Paginator
+from django.utils.decorators import classonlymethod
+
+from jigsawview.instrumentation import no_measurement
+from jigsawview.pieces import Piece, ObjectPiece
+from jigsawview.utils import uses_default
+from jigsawview.views import JigsawView, merge_contexts
+
+
+class AsyncMeasurement(object):
+    """
+    Wraps a measurement for the coroutines. The queries are counted in the
+    thread the synchronous code and the asynchronous ORM of the request run
+    in.
+    """
+
+    def __init__(self, measurement):
+        self.measurement = measurement
+
+    async def __aenter__(self):
+        if self.measurement is not no_measurement:
+            await sync_to_async(self.measurement.__enter__)()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if self.measurement is not no_measurement:
+            await sync_to_async(self.measurement.__exit__)(
+                exc_type, exc_value, traceback)
+
+
+no_async_measurement = AsyncMeasurement(no_measurement)
+
+
+class AsyncJigsawView(JigsawView):
+    """
+    A JigsawView served by a coroutine.
+
+    Pieces hooks can be coroutines named after the synchronous ones with an
+    'a' prefix (aget_context_data, adispatch). Pieces without them run their
+    synchronous hooks through sync_to_async so both kinds can be mixed
+    within a view. Pieces which don't depend on each other are gathered.
+
+    The instrumented views measure the same phases as the synchronous ones.
+    The measures of gathered pieces overlap and count each other's queries.
+    """
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        """
+        Main entry point for a request-response process.
+        """
+        cls.check_initkwargs(initkwargs)
+        prototype = cls.get_prototype(initkwargs)
+
+        async def view(request, *args, **kwargs):
+            if prototype is not None:
+                self = prototype.for_request(request, *args, **kwargs)
+            else:
+                self = cls(**initkwargs)
+            return await self.dispatch(request, *args, **kwargs)
+
+        # take name and docstring from class
+        update_wrapper(view, cls, updated=())
+
+        # and possible attributes set by decorators
+        # like csrf_exempt from dispatch
+        update_wrapper(view, cls.dispatch, assigned=())
+        return view
+
+    def ameasure(self, piece, phase):
+        """
+        Returns an asynchronous context manager measuring a phase of a piece
+        when the view is instrumented.
+        """
+        if self.instrumentation is None:
+            return no_async_measurement
+        return AsyncMeasurement(self.measure(piece, phase))
+
+    async def call_piece(self, piece, name, *args, **kwargs):
+        """
+        Awaits the piece's coroutine hook for name or runs the synchronous
+        one in a thread.
+        """
+        method = getattr(piece, 'a' + name, None)
+        if method is not None:
+            return await method(*args, **kwargs)
+        return await sync_to_async(getattr(piece, name))(*args, **kwargs)
+
+    async def get_context_data(self, request, **kwargs):
+        """
+        Returns all the aggregated contexes from the pieces.
+
+        Each piece of a group of independent pieces gets a copy of the
+        context computed by the pieces it depends on. The values they add or
+        change are then merged following the declaration order.
+        """
+        for level in self.execution_plan.context_levels:
+            pieces = [self._pieces[i] for i in level]
+            if len(pieces) == 1:
+                self.context = await self.get_piece_context_data(
+                    pieces[0], self.context, kwargs)
+                continue
+            snapshot = self.context
+            results = await asyncio.gather(*[
+                self.get_piece_context_data(piece, dict(snapshot), kwargs)
+                for piece in pieces])
+            self.context = merge_contexts(snapshot, results)
+        return self.context
+
+    async def get_piece_context_data(self, piece, context, kwargs):
+        """
+        Returns the context updated by a single piece.
+        """
+        if piece.lazy:
+            return self.get_lazy_context_data(piece, context, kwargs)
+        async with self.ameasure(piece, 'context'):
+            if piece.is_cacheable():
+                return await sync_to_async(piece.get_cached_context_data)(
+                    context, **kwargs)
+            return await self.call_piece(piece, 'get_context_data',
+                context, **kwargs)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.request, self.args, self.kwargs = request, args, kwargs
+        for piece in self._kwargs_pieces:
+            with self.measure(piece, 'add_kwargs'):
+                piece.add_kwargs(**kwargs)
+                piece.add_kwargs(request=request)
+        validators = None
+        if self.conditional_response:
+            validators, response = await sync_to_async(
+                self.get_conditional_response)(request, **kwargs)
+            if response is not None:
+                return self.report_measures(request, response)
+        context = await self.get_context_data(request, **kwargs)
+        for piece in self._dispatch_pieces:
+            if not hasattr(piece, 'adispatch') and \
+                    uses_default(type(piece), 'dispatch', Piece):
+                continue
+            async with self.ameasure(piece, 'dispatch'):
+                result = await self.call_piece(piece, 'dispatch', context)
+            if result:
+                return self.report_measures(request, result)
+        response = self.finalize_response(
+            self.render_to_response(request, context), validators)
+        return self.report_measures(request, response)
+
+
+class AsyncObjectPiece(ObjectPiece):
+    """
+    An ObjectPiece using Django's asynchronous ORM for the 'detail',
+    'delete' and 'list' modes.
+
+    Filtered lists, keyset and custom paginators, streamed lists as well as
+    the forms of the 'update' and 'new' modes are handled by the synchronous
+    code in a thread.
+    """
+
+    async def aget_queryset(self):
+        """
+        Returns the queryset to look the objects up against. Lists with a
+        parent fetch the parent piece's object in a thread.
+        """
+        if self.get_parent_piece() is not None:
+            return await sync_to_async(self.get_request_queryset)()
+        return self.get_request_queryset()
+
+    async def aget_object(self, queryset=None, **kwargs):
+        """
+        Returns the object the view is displaying. Objects with parents or
+        children are fetched by the synchronous chain lookup in a thread.
+        """
+        if queryset is None:
+            obj = await sync_to_async(self.get_chain_object)(**kwargs)
+            if obj is not None:
+                return obj
+            queryset = await self.aget_queryset()
+        queryset = self.get_object_queryset(queryset, **kwargs)
+        try:
+            return await queryset.aget()
+        except ObjectDoesNotExist:
+            raise self.object_not_found(queryset)
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """
+        Paginate the queryset, if needed.
+        """
+        page = self.request.GET.get(self.page_kwarg) or 1
+        if page == self.page_all_name:
+            return (None, None, queryset, False)
+        if self.pagination == 'keyset' or \
+                self.paginator_class is not Paginator:
+            return await sync_to_async(self.paginate_queryset)(
+                queryset, page_size)
+        paginator = self.get_paginator(
+            queryset, page_size, orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty())
+        # Paginator.count is a cached property which would otherwise run
+        # a synchronous COUNT query
+        paginator.__dict__['count'] = await queryset.acount()
+        page = self.get_page(paginator, self.get_page_number(paginator, page))
+        page.object_list = [obj async for obj in page.object_list]
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    async def aget_context_data(self, context, **kwargs):
+        mode = self.mode
+        if mode in ('detail', 'delete'):
+            obj = await self.aget_object(**kwargs)
+            context[self.get_context_object_name(obj)] = obj
+            return context
+        if mode != 'list' or self.get_filter_class():
+            return await sync_to_async(self.get_context_data)(
+                context, **kwargs)
+
+        objs = await self.aget_queryset()
+        context_object_name = self.get_context_object_name()
+        page_size = self.get_paginate_by(objs)
+        paginator, page, is_paginated = None, None, False
+        if page_size:
+            paginator, page, objs, is_paginated = \
+                await self.apaginate_queryset(objs, page_size)
+        context.update({
+            context_object_name + '_list': objs,
+            context_object_name + '_is_paginated': is_paginated,
+            context_object_name + '_paginator': paginator,
+            context_object_name + '_page_obj': page,
+        })
+        if hasattr(self.paginator_class, 'count_is_approximate'):
+            context[context_object_name + '_count_is_approximate'] = \
+                getattr(paginator, 'count_is_approximate', False)
+        return context
+
+    async def adispatch(self, context):
+        if self.mode in ('update', 'new') or self.is_streamed(context):
+            return await sync_to_async(self.dispatch)(context)
+        return
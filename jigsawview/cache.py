@@ -0,0 +1,87 @@
+"""
+Cache helpers for the pieces' context.
+
+Cached pieces include a generation number per model in their cache keys.
+Saving an object bumps its model's generation which makes the entries built
+with the former one unreachable.
+"""
+
+from __future__ import unicode_literals
+
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS
+try:
+    from django.core.cache import caches
+except ImportError:  # Django < 1.7
+    from django.core.cache import get_cache
+else:
+    def get_cache(alias):
+        return caches[alias]
+
+
+GENERATION_KEY_PREFIX = 'jigsawview.generation'
+# Generations have to outlive the entries depending on them
+GENERATION_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def get_generation_key(model):
+    opts = model._meta
+    return '%s.%s.%s' % (GENERATION_KEY_PREFIX, opts.app_label,
+        opts.object_name.lower())
+
+
+def new_generation():
+    """
+    Returns a generation number which can't collide with one used before,
+    even after the previous one has been evicted from the cache.
+    """
+    return int(time.time() * 1000000)
+
+
+def get_generations(models, alias=DEFAULT_CACHE_ALIAS):
+    """
+    Returns the list of the current generations of the models.
+    """
+    cache = get_cache(alias)
+    keys = [get_generation_key(model) for model in models]
+    if not keys:
+        return []
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # add doesn't override a generation set concurrently
+            cache.add(key, new_generation(), GENERATION_TIMEOUT)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def invalidate_model_cache(models, alias=DEFAULT_CACHE_ALIAS):
+    """
+    Discards the cached pieces depending on the models.
+    """
+    cache = get_cache(alias)
+    for model in models:
+        key = get_generation_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_generation(), GENERATION_TIMEOUT)
+
+
+def get_request_attribute(request, path):
+    """
+    Returns the request's value for a dotted path such as 'user.pk',
+    'LANGUAGE_CODE' or 'GET.page'. Query dicts return the lists of values.
+    """
+    value = request
+    for name in path.split('.'):
+        if hasattr(value, 'getlist'):
+            value = value.getlist(name)
+        else:
+            value = getattr(value, name, None)
+            if callable(value):
+                value = value()
+    if hasattr(value, 'lists'):
+        value = sorted(value.lists())
+    return value
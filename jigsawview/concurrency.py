@@ -0,0 +1,77 @@
+"""
+Thread pools running the independent pieces of a view concurrently.
+
+Python 2 requires the futures backport of concurrent.futures. Without it the
+pieces are computed one after the other.
+"""
+
+from __future__ import unicode_literals
+
+import threading
+
+from django.db import connections
+
+try:
+    from concurrent import futures
+except ImportError:
+    futures = None
+
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def get_executor(max_workers):
+    """
+    Returns the process wide thread pool with max_workers threads or None
+    when concurrent.futures isn't available.
+    """
+    if futures is None:
+        return None
+    try:
+        return _executors[max_workers]
+    except KeyError:
+        pass
+    with _lock:
+        if max_workers not in _executors:
+            _executors[max_workers] = futures.ThreadPoolExecutor(
+                max_workers=max_workers)
+        return _executors[max_workers]
+
+
+def in_transaction():
+    """
+    Returns whether the current thread's connections are within a
+    transaction, whose changes the pool threads wouldn't see.
+    """
+    for connection in connections.all():
+        if hasattr(connection, 'in_atomic_block'):  # Django >= 1.6
+            if connection.in_atomic_block:
+                return True
+        elif connection.is_managed():
+            return True
+    return False
+
+
+def close_connections():
+    """
+    Closes the current thread's database connections which are no longer
+    usable or have outlived their CONN_MAX_AGE.
+    """
+    for connection in connections.all():
+        if hasattr(connection, 'close_if_unusable_or_obsolete'):
+            connection.close_if_unusable_or_obsolete()
+        else:
+            connection.close()
+
+
+def run_in_thread(func, *args, **kwargs):
+    """
+    Calls func within a pool thread, taking care of the thread's database
+    connections.
+    """
+    close_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_connections()
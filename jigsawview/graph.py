@@ -0,0 +1,101 @@
+"""
+Dependencies between the pieces of a view.
+
+Pieces may declare the context names they require and provide. A piece
+always provides its own name and the names starting with its name followed by
+an underscore (obj, obj_list, obj_form...).
+Pieces that don't declare their requirements depend on every piece declared
+before them, which keeps the declaration order.
+"""
+
+from __future__ import unicode_literals
+
+from django.core.exceptions import ImproperlyConfigured
+try:
+    from django.utils.datastructures import SortedDict
+except ImportError:  # Django >= 1.9
+    from collections import OrderedDict as SortedDict
+
+
+def find_provider(key, names, providers):
+    """
+    Returns the name of the piece providing the key or None.
+    """
+    if key in providers:
+        return providers[key]
+    # The longest matching piece name wins so that obj_data_formset belongs
+    # to obj_data rather than obj.
+    candidates = [name for name in names
+        if key == name or key.startswith(name + '_')]
+    if candidates:
+        return max(candidates, key=len)
+    return None
+
+
+def build_dependencies(pieces):
+    """
+    Returns a SortedDict mapping each piece name to the tuple of the piece
+    names it depends on.
+    """
+    names = list(pieces.keys())
+    providers = {}
+    for name, unbound in pieces.items():
+        for key in unbound.bound_cls.provides or ():
+            providers[key] = name
+
+    dependencies = SortedDict()
+    for index, (name, unbound) in enumerate(pieces.items()):
+        requires = unbound.bound_cls.requires
+        if requires is None:
+            dependencies[name] = tuple(names[:index])
+            continue
+        # Pieces depend on their parent piece
+        parent = getattr(unbound.bound_cls, 'parent', None)
+        if parent:
+            requires = tuple(requires) + (parent,)
+        result = []
+        for key in requires:
+            provider = find_provider(key, names, providers)
+            if provider is None or provider == name:
+                raise ImproperlyConfigured(
+                    "Piece '%s' requires '%s' which no other piece "
+                    "provides." % (name, key))
+            if provider not in result:
+                result.append(provider)
+        dependencies[name] = tuple(result)
+    return dependencies
+
+
+def sort_dependencies(dependencies):
+    """
+    Returns the piece names ordered so that each piece comes after the ones
+    it depends on. Independent pieces keep the declaration order.
+    Raises ImproperlyConfigured on cycles.
+    """
+    names = list(dependencies.keys())
+    done = set()
+    result = []
+    while len(result) < len(names):
+        for name in names:
+            if name not in done and \
+                    all(dep in done for dep in dependencies[name]):
+                done.add(name)
+                result.append(name)
+                break
+        else:
+            raise ImproperlyConfigured(
+                "Circular dependency between the pieces %s." % ', '.join(
+                    "'%s'" % name for name in names if name not in done))
+    return result
+
+
+def get_levels(dependencies, order):
+    """
+    Returns a dict of the piece names to their depth in the graph. Pieces
+    of a same level don't depend on each other.
+    """
+    levels = {}
+    for name in order:
+        levels[name] = max([levels[dep] + 1
+            for dep in dependencies[name]] or [0])
+    return levels
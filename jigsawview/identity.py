@@ -0,0 +1,139 @@
+"""
+Request scoped identity map shared by the pieces of a view.
+"""
+
+from __future__ import unicode_literals
+
+import threading
+
+from django.core.exceptions import ValidationError
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError:
+    from django.db.models.sql.datastructures import EmptyResultSet
+
+
+def get_model_key(model):
+    """
+    Proxy models share their concrete model's identities.
+    """
+    opts = model._meta
+    return getattr(opts, 'concrete_model', None) or model
+
+
+def get_related_model(field):
+    """
+    Returns the model a foreign key points to or None for other fields.
+    """
+    if field.get_internal_type() not in ('ForeignKey', 'OneToOneField'):
+        return None
+    remote_field = getattr(field, 'remote_field', None) or field.rel
+    return getattr(remote_field, 'model', None) or remote_field.to
+
+
+class IdentityMap(object):
+    """
+    The objects fetched during a request by model and primary key.
+
+    Single object lookups are remembered by their SQL query so that pieces
+    running the same lookup don't query the database again and share the
+    object. Lookups with different querysets run and return their own
+    instance, which keeps the scoping, annotations and deferred fields of
+    each piece. Objects pointing to an object of the map through a foreign
+    key get the instance registered first as their related object.
+
+    The map can be used from the threads of the concurrent pieces.
+    """
+
+    def __init__(self):
+        self._objects = {}
+        self._lookups = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, obj):
+        return (get_model_key(type(obj)), obj.pk) in self._objects
+
+    def get(self, model, pk):
+        """
+        Returns the object of model with the given primary key or None.
+        """
+        try:
+            pk = model._meta.pk.to_python(pk)
+        except ValidationError:
+            return None
+        return self._objects.get((get_model_key(model), pk))
+
+    def add(self, obj):
+        """
+        Registers the object, unless another instance has the same identity,
+        and links it with the related objects of the map.
+        """
+        if obj is None or obj.pk is None:
+            return obj
+        key = (get_model_key(type(obj)), obj.pk)
+        with self._lock:
+            if key not in self._objects:
+                self._objects[key] = obj
+                # Objects fetched before may point to this one
+                for other in list(self._objects.values()):
+                    if other is not obj:
+                        self.attach_related(other)
+            self.attach_related(obj)
+        return obj
+
+    def attach_related(self, obj):
+        """
+        Sets the objects of the map in the foreign keys caches of obj.
+        """
+        for field in obj._meta.fields:
+            model = get_related_model(field)
+            if model is None:
+                continue
+            value = getattr(obj, field.attname)
+            if value is None:
+                continue
+            related = self._objects.get((get_model_key(model), value))
+            if related is None:
+                continue
+            if hasattr(field, 'set_cached_value'):
+                if not field.is_cached(obj):
+                    field.set_cached_value(obj, related)
+            elif not hasattr(obj, field.get_cache_name()):
+                setattr(obj, field.get_cache_name(), related)
+
+    def get_lookup_key(self, queryset):
+        """
+        Returns a key identifying the queryset's SQL or None.
+        """
+        try:
+            sql, params = queryset.query.sql_with_params()
+            key = (queryset.db, get_model_key(queryset.model), sql,
+                tuple(params))
+            hash(key)
+        except (EmptyResultSet, TypeError):
+            return None
+        return key
+
+    def get_object(self, queryset):
+        """
+        Returns queryset.get(), only querying the database the first time a
+        same lookup is done.
+        """
+        key = self.get_lookup_key(queryset)
+        if key is not None and key in self._lookups:
+            return self._lookups[key]
+        # The query runs outside of the lock so that concurrent pieces
+        # don't wait for each other
+        obj = self.add(queryset.get())
+        if key is not None:
+            with self._lock:
+                obj = self._lookups.setdefault(key, obj)
+        return obj
+
+    def clear(self):
+        with self._lock:
+            self._objects.clear()
+            self._lookups.clear()
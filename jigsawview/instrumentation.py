@@ -0,0 +1,176 @@
+"""
+Per piece instrumentation of the JigsawView requests.
+
+Each phase of each piece (add_kwargs, context, dispatch) as well as the
+rendering are measured: wall time, number of queries and time spent in the
+database.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import threading
+import time
+
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connections
+from django.dispatch import Signal
+
+
+logger = logging.getLogger('jigsawview')
+
+# Sent once a view's response is built, with the view, request, response
+# and measures arguments.
+request_measured = Signal()
+
+Measure = namedtuple('Measure', 'piece phase duration queries query_time')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter(object):
+    """
+    Counts the queries run on the current thread's connections and the time
+    spent in them.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.time()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.time += time.time() - start
+
+    def __enter__(self):
+        self._wrappers = []
+        self._debug = []
+        for connection in connections.all():
+            if hasattr(connection, 'execute_wrapper'):
+                wrapper = connection.execute_wrapper(self)
+                wrapper.__enter__()
+                self._wrappers.append(wrapper)
+            else:
+                # Older Django versions only log the queries
+                flag = hasattr(connection, 'force_debug_cursor') and \
+                    'force_debug_cursor' or 'use_debug_cursor'
+                self._debug.append((connection, flag,
+                    getattr(connection, flag), len(connection.queries)))
+                setattr(connection, flag, True)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for wrapper in reversed(self._wrappers):
+            wrapper.__exit__(exc_type, exc_value, traceback)
+        for connection, flag, value, start in self._debug:
+            queries = connection.queries[start:]
+            self.queries += len(queries)
+            self.time += sum(float(query['time']) for query in queries)
+            setattr(connection, flag, value)
+
+
+class Measurement(object):
+    """
+    Measures a phase of a piece, the piece being None for the view's phases.
+    """
+
+    def __init__(self, instrumentation, piece, phase):
+        self.instrumentation = instrumentation
+        self.piece = piece
+        self.phase = phase
+        self.counter = QueryCounter()
+
+    def __enter__(self):
+        self.counter.__enter__()
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.time() - self.start
+        self.counter.__exit__(exc_type, exc_value, traceback)
+        name = self.piece is not None and self.piece.view_name or None
+        self.instrumentation.add(Measure(name, self.phase, duration,
+            self.counter.queries, self.counter.time), self.piece,
+            exc_type is None)
+
+
+class NoMeasurement(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return
+
+
+no_measurement = NoMeasurement()
+
+
+class Instrumentation(object):
+    """
+    The measures of a view's request.
+
+    Pieces exceeding their query_budget, or the view's one, either raise a
+    QueryBudgetExceeded exception or log a warning according to the view's
+    query_budget_action. When it's None, the exception is raised in DEBUG
+    mode.
+    """
+
+    def __init__(self, view):
+        self.view = view
+        self.measures = []
+        self.queries = {}
+        self.exceeded = set()
+        # Concurrent pieces add their measures from the pool threads
+        self.lock = threading.Lock()
+
+    def measure(self, piece, phase):
+        return Measurement(self, piece, phase)
+
+    def add(self, measure, piece, check=True):
+        with self.lock:
+            self.measures.append(measure)
+            if piece is None:
+                return
+            queries = self.queries.get(measure.piece, 0) + measure.queries
+            self.queries[measure.piece] = queries
+            budget = piece.query_budget
+            if budget is None:
+                budget = self.view.query_budget
+            exceeded = check and budget is not None and queries > budget \
+                and measure.piece not in self.exceeded
+            if exceeded:
+                self.exceeded.add(measure.piece)
+        if exceeded:
+            self.budget_exceeded(piece, queries, budget)
+
+    def budget_exceeded(self, piece, queries, budget):
+        message = "Piece '%s' of %s ran %s queries, its budget is %s." % (
+            piece.view_name, self.view.__class__.__name__, queries, budget)
+        action = self.view.query_budget_action
+        if action is None:
+            action = settings.DEBUG and 'raise' or 'log'
+        if action == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+    def get_server_timing(self):
+        """
+        Returns the value of the Server-Timing header.
+        """
+        metrics = []
+        for measure in self.measures:
+            name = measure.phase
+            if measure.piece:
+                name = '%s.%s' % (measure.piece, measure.phase)
+            metrics.append('%s;dur=%.2f;desc="%s queries"' % (
+                name, measure.duration * 1000, measure.queries))
+        return ', '.join(metrics)
@@ -0,0 +1,69 @@
+"""
+Lazily computed context values.
+"""
+
+from __future__ import unicode_literals
+
+import operator
+
+from django.utils.functional import SimpleLazyObject, new_method_proxy, empty
+
+
+class LazyValue(SimpleLazyObject):
+    """
+    A proxy to the result of a function, which is only called the first time
+    the value is used - usually when a template reads it.
+    It behaves like the proxied value, including isinstance checks.
+    """
+
+    # Django < 1.5 lazy objects are always true
+    __bool__ = new_method_proxy(bool)
+    __nonzero__ = __bool__
+    __len__ = new_method_proxy(len)
+    __iter__ = new_method_proxy(iter)
+    __getitem__ = new_method_proxy(operator.getitem)
+    __contains__ = new_method_proxy(operator.contains)
+
+
+class LazyContext(object):
+    """
+    Computes the context contribution of a lazy piece the first time one
+    of its values is used.
+    The piece works on a copy of the context as it was when the piece's
+    turn came.
+    """
+
+    def __init__(self, piece, context, kwargs):
+        self.piece = piece
+        self.context = dict(context)
+        self.kwargs = kwargs
+        self.result = None
+
+    def evaluate(self):
+        if self.result is None:
+            self.result = self.piece.get_context_data(
+                self.context, **self.kwargs)
+        return self.result
+
+    def get(self, name):
+        return self.evaluate().get(name)
+
+    def contribute(self, context):
+        """
+        Adds the lazy values of the piece to context.
+        """
+        for name in self.piece.get_context_names():
+            context[name] = LazyValue(self._getter(name))
+        return context
+
+    def _getter(self, name):
+        return lambda: self.get(name)
+
+
+def is_evaluated(value):
+    """
+    Returns False for a LazyValue which hasn't been computed yet.
+    """
+    if isinstance(value, SimpleLazyObject):
+        return value.__dict__['_wrapped'] is not empty
+    return True
@@ -0,0 +1,302 @@
+"""
+Paginators for the list pieces.
+"""
+
+from __future__ import unicode_literals
+
+import base64
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import (Paginator, Page, InvalidPage, EmptyPage,
+    PageNotAnInteger)
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError:
+    from django.db.models.sql.datastructures import EmptyResultSet
+try:
+    from django.utils.encoding import force_text
+except ImportError:
+    try:
+        from django.utils.encoding import force_unicode as force_text
+    except ImportError:  # Django >= 4.0
+        from django.utils.encoding import force_str as force_text
+
+from jigsawview.cache import get_cache
+
+
+class KeysetPaginator(object):
+    """
+    Paginates a queryset on a unique ordering key.
+
+    Pages are identified by opaque cursors instead of numbers which means no
+    COUNT nor OFFSET queries are involved. The key is a model field name,
+    prefixed by '-' for a descending order.
+    """
+
+    def __init__(self, queryset, per_page, key='pk',
+                 allow_empty_first_page=True):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.key = key
+        self.field = key.lstrip('-')
+        self.descending = key.startswith('-')
+        self.allow_empty_first_page = allow_empty_first_page
+
+    def encode_cursor(self, direction, value):
+        """
+        Returns the cursor to the rows after (direction 'n') or before
+        (direction 'p') the given key value.
+        """
+        raw = ('%s:%s' % (direction, force_text(value))).encode('utf-8')
+        return force_text(base64.urlsafe_b64encode(raw)).rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        Returns the (direction, value) tuple for a cursor.
+        '1' and 'last' respectively stand for the first and last pages.
+        """
+        if cursor in (None, 1, '1'):
+            return 'n', None
+        if cursor == 'last':
+            return 'p', None
+        try:
+            cursor = str(cursor)
+            padding = '=' * (-len(cursor) % 4)
+            raw = force_text(base64.urlsafe_b64decode(
+                (cursor + padding).encode('ascii')))
+            direction, value = raw.split(':', 1)
+        except (TypeError, ValueError, UnicodeError):
+            raise InvalidPage('Invalid cursor')
+        if direction not in ('n', 'p'):
+            raise InvalidPage('Invalid cursor')
+        return direction, value
+
+    def get_key_value(self, obj):
+        return getattr(obj, self.field)
+
+    def get_key_field(self):
+        opts = self.queryset.model._meta
+        if self.field == 'pk':
+            return opts.pk
+        return opts.get_field(self.field)
+
+    def to_python(self, value):
+        """
+        Converts a cursor's key value, raising InvalidPage for the values
+        that don't match the key field.
+        """
+        try:
+            return self.get_key_field().to_python(value)
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidPage('Invalid cursor')
+
+    def page(self, cursor=None):
+        """
+        Returns the page for the given cursor.
+        """
+        direction, value = self.decode_cursor(cursor)
+        forward = direction == 'n'
+        ascending = forward != self.descending
+        queryset = self.queryset
+        if value is not None:
+            value = self.to_python(value)
+            lookup = '%s__%s' % (self.field, ascending and 'gt' or 'lt')
+            queryset = queryset.filter(**{lookup: value})
+        ordering = ascending and self.field or '-' + self.field
+        # Fetch an extra row to know if there's something after this page
+        rows = list(queryset.order_by(ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            has_next, has_previous = has_more, value is not None
+        else:
+            rows.reverse()
+            has_next, has_previous = value is not None, has_more
+        if not rows and not self.allow_empty_first_page and value is None:
+            raise InvalidPage('That page contains no results')
+        return KeysetPage(rows, self, has_next, has_previous)
+
+
+class KeysetPage(object):
+    """
+    A page returned by the KeysetPaginator.
+
+    next_page_number and previous_page_number return cursors so templates
+    written for Django's Page keep working.
+    """
+
+    number = None
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Keyset page of %s items>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor('n',
+            self.paginator.get_key_value(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode_cursor('p',
+            self.paginator.get_key_value(self.object_list[0]))
+
+    def next_page_number(self):
+        return self.next_cursor
+
+    def previous_page_number(self):
+        return self.previous_cursor
+
+
+class CountlessPaginator(Paginator):
+    """
+    A Paginator which never counts the rows.
+
+    Each page fetches one extra row to know whether there's a next page.
+    num_pages and count are still available but will run a COUNT query,
+    which is the case when the 'last' page is requested, unless the page
+    was the last one. The count is always exact.
+    """
+
+    count_is_approximate = False
+
+    def __init__(self, *args, **kwargs):
+        super(CountlessPaginator, self).__init__(*args, **kwargs)
+        self._exact_count = None
+
+    @property
+    def count(self):
+        if self._exact_count is None:
+            self._exact_count = super(CountlessPaginator, self).count
+        return self._exact_count
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:
+            bottom + self.per_page + self.orphans + 1])
+        has_next = len(rows) > self.per_page + self.orphans
+        if has_next:
+            rows = rows[:self.per_page]
+        if not rows and (number > 1 or not self.allow_empty_first_page):
+            raise EmptyPage('That page contains no results')
+        if not has_next:
+            # The last page tells how many rows there are
+            self._exact_count = bottom + len(rows)
+        return CountlessPage(rows, number, self, has_next)
+
+
+class CountlessPage(Page):
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super(CountlessPage, self).__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
+
+
+class CachedCountPaginator(Paginator):
+    """
+    A Paginator that keeps the row count in Django's cache.
+
+    The count is stored in the count_cache_alias cache under a key derived
+    from the SQL query and its parameters, which include the filters, for
+    count_timeout seconds. When the count comes from the cache,
+    count_is_approximate is True.
+    """
+
+    count_timeout = 60
+    count_cache_alias = 'default'
+    count_key_prefix = 'jigsawview.count'
+    count_is_approximate = False
+
+    def __init__(self, *args, **kwargs):
+        self.count_timeout = kwargs.pop('count_timeout', self.count_timeout)
+        self.count_cache_alias = kwargs.pop('count_cache_alias',
+            self.count_cache_alias)
+        super(CachedCountPaginator, self).__init__(*args, **kwargs)
+        self.count_is_approximate = False
+        self._cached_count = None
+
+    def get_count_cache_key(self):
+        """
+        Returns the cache key for the count or None if the object list
+        isn't a queryset.
+        """
+        try:
+            sql, params = self.object_list.query.sql_with_params()
+            key = (self.object_list.db, sql, tuple(params))
+        except (AttributeError, EmptyResultSet):
+            return None
+        digest = hashlib.md5(repr(key).encode('utf-8')).hexdigest()
+        return '%s.%s' % (self.count_key_prefix, digest)
+
+    def compute_count(self):
+        try:
+            return self.object_list.count()
+        except (AttributeError, TypeError):
+            # AttributeError if object_list has no count() method.
+            # TypeError if object_list.count() requires arguments
+            # (i.e. is of type list).
+            return len(self.object_list)
+
+    @property
+    def count(self):
+        if self._cached_count is None:
+            cache = get_cache(self.count_cache_alias)
+            key = self.get_count_cache_key()
+            count = key and cache.get(key)
+            if count is None:
+                count = self.compute_count()
+                if key:
+                    cache.set(key, count, self.count_timeout)
+            else:
+                self.count_is_approximate = True
+            self._cached_count = count
+        return self._cached_count
@@ -5,11 +5,28 @@ Base classes for the jigsawview pieces
 from __future__ import unicode_literals
 
 import copy
+import hashlib
+import pickle
+import types
+
+from jigsawview.cache import (get_cache, get_generations,
+    invalidate_model_cache, get_request_attribute)
+from jigsawview.utils import make_key
+
+
+def ignores_declaration_kwargs(init):
+    """
+    Marks a piece's __init__ which doesn't need the declaration arguments,
+    as it reads them from the class attributes of the bound piece class.
+    """
+    init.ignores_declaration_kwargs = True
+    return init
 
 
 class UnboundPiece(object):
     cls = None
     cls_kwargs = {}
+    bound_cls = None
 
     def __init__(self, cls, **kwargs):
         self.cls = cls
@@ -19,11 +36,45 @@ class UnboundPiece(object):
         self.creation_counter = BasePiece.creation_counter
         BasePiece.creation_counter += 1
 
+        self.bound_cls = self.get_bound_class()
+        self.init_kwargs = self.get_init_kwargs()
+
+    def get_init_kwargs(self):
+        """
+        Returns the declaration arguments passed to __init__ when binding.
+        They're only passed when an __init__ of the piece's classes isn't
+        marked with ignores_declaration_kwargs.
+        """
+        for klass in self.cls.__mro__:
+            init = vars(klass).get('__init__')
+            if klass is object or init is None:
+                continue
+            if not getattr(init, 'ignores_declaration_kwargs', False):
+                return self.cls_kwargs
+        return {}
+
+    def get_bound_class(self):
+        """
+        Returns a subclass of cls holding the declaration arguments as class
+        attributes. Binding a piece then only sets the per request values.
+        """
+        attrs = {
+            '__module__': self.cls.__module__,
+            'creation_counter': self.creation_counter,
+        }
+        for k, v in self.cls_kwargs.items():
+            # Functions are kept as is instead of becoming methods
+            if isinstance(v, types.FunctionType):
+                v = staticmethod(v)
+            attrs[k] = v
+        return type(self.cls.__name__, (self.cls,), attrs)
+
     def __call__(self, **instance_kwargs):
-        kwargs = copy.copy(self.cls_kwargs)
-        kwargs.update(instance_kwargs)
-        kwargs['creation_counter'] = self.creation_counter
-        return self.cls(bound=True, **kwargs)
+        if self.init_kwargs:
+            kwargs = dict(self.init_kwargs)
+            kwargs.update(instance_kwargs)
+            instance_kwargs = kwargs
+        return self.bound_cls(bound=True, **instance_kwargs)
 
 
 class BasePiece(object):
@@ -35,13 +86,19 @@ class BasePiece(object):
         bound = kwargs.pop('bound', False)
         if not bound:
             return UnboundPiece(cls, **kwargs)
-        return super(BasePiece, cls).__new__(cls, **kwargs)
+        return super(BasePiece, cls).__new__(cls)
 
+    @ignores_declaration_kwargs
     def __init__(self, *args, **kwargs):
         for k, v in kwargs.items():
             setattr(self, k, v)
         super(BasePiece, self).__init__()
 
+    def __copy__(self):
+        piece = super(BasePiece, self).__new__(self.__class__)
+        piece.__dict__.update(self.__dict__)
+        return piece
+
     def add_kwargs(self, **kwargs):
         for k, v in kwargs.items():
             setattr(self, k, v)
@@ -55,13 +112,47 @@ class Piece(BasePiece):
     view_mode = None
     default_mode = None
     inherited_piece = False
+    lazy = False
+    # Context names this piece reads and adds. requires = None means the
+    # piece depends on every piece declared before it.
+    requires = None
+    provides = None
+    # Seconds the piece's context is cached for GET requests, None to
+    # disable caching.
+    cache_timeout = None
+    cache_alias = 'default'
+    cache_key_prefix = 'jigsawview.piece'
+    # Dotted request paths the cached context depends on, like 'user.pk'
+    cache_request_attributes = ()
+    # Models whose saves invalidate the cached context
+    cache_models = ()
+    # Maximum number of queries for the instrumented views
+    query_budget = None
 
+    @ignores_declaration_kwargs
     def __init__(self, *args, **kwargs):
         super(Piece, self).__init__(*args, **kwargs)
         self.mode = self.mode or \
             (self.inherited_piece and self.default_mode) or \
             self.view_mode
 
+    def for_view(self, view):
+        """
+        Returns a copy of the piece bound to a reusable view's copy for a
+        request.
+        """
+        piece = copy.copy(self)
+        piece.view = view
+        piece.reset_request_state()
+        return piece
+
+    def reset_request_state(self):
+        """
+        Sets the initial values of the attributes a piece changes while
+        handling a request.
+        """
+        return
+
     def get_template_name(self, *args, **kwargs):
         """
         Give the desired template name for this piece
@@ -72,11 +163,122 @@ class Piece(BasePiece):
             return '%s_%s' % (self.template_name_prefix, self.mode)
         return None
 
+    def get_context_names(self):
+        """
+        Returns the names this piece adds to the context, or None when they
+        aren't known in advance. Pieces need to know them to be lazy.
+        """
+        return None
+
     def get_context_data(self, context, *args, **kwargs):
         """
         Compute the view context for this piece.
         """
         return context
 
+    def get_identity_map(self):
+        """
+        Returns the view's identity map or None for pieces used without
+        a view.
+        """
+        return getattr(getattr(self, 'view', None), 'identity_map', None)
+
+    def get_validator(self, **kwargs):
+        """
+        Returns a (last_modified, etag) tuple describing the state of the
+        data this piece displays, either value may be None. Returning None
+        means the piece can't tell and prevents conditional responses.
+        """
+        return None
+
+    def is_safe_request(self):
+        """
+        Returns whether the request only reads data, in which case the
+        forms are neither validated nor saved.
+        """
+        request = getattr(self, 'request', None)
+        return request is not None and \
+            request.method in ('GET', 'HEAD', 'OPTIONS')
+
+    #
+    # Cache
+    #
+
+    def is_cacheable(self):
+        """
+        Returns whether the piece's context is cached for this request.
+        """
+        request = getattr(self, 'request', None)
+        return self.cache_timeout is not None and request is not None and \
+            request.method in ('GET', 'HEAD')
+
+    def get_cache_models(self):
+        """
+        Returns the models whose changes invalidate the cached context.
+        """
+        return tuple(self.cache_models)
+
+    def get_cache_request_attributes(self):
+        """
+        Returns the dotted request paths the cached context depends on.
+        """
+        return tuple(self.cache_request_attributes)
+
+    def get_cache_key(self, **kwargs):
+        """
+        Returns the cache key for the piece's context. It depends on the
+        view, the piece's name and mode, the URL arguments, the
+        cache_request_attributes and the generations of the cache models.
+        """
+        view = getattr(self, 'view', None)
+        parts = [
+            view and '%s.%s' % (view.__module__, view.__class__.__name__),
+            self.view_name,
+            self.mode,
+            make_key(kwargs),
+        ]
+        for path in self.get_cache_request_attributes():
+            parts.append((path, get_request_attribute(self.request, path)))
+        parts.append(get_generations(self.get_cache_models(),
+            self.cache_alias))
+        digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+        return '%s.%s' % (self.cache_key_prefix, digest)
+
+    def get_cache_values(self, values):
+        """
+        Returns the values added to the context to store in the cache.
+        """
+        return values
+
+    def get_cached_context_data(self, context, **kwargs):
+        """
+        Returns the context updated with the values this piece added to it
+        for the same cache key, computing them on a miss.
+        """
+        cache = get_cache(self.cache_alias)
+        key = self.get_cache_key(**kwargs)
+        values = cache.get(key)
+        if values is not None:
+            context.update(values)
+            return context
+        snapshot = dict(context)
+        context = self.get_context_data(context, **kwargs)
+        values = self.get_cache_values(dict(
+            (k, v) for k, v in context.items()
+            if k not in snapshot or snapshot[k] is not v))
+        try:
+            cache.set(key, values, self.cache_timeout)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # Values which can't be pickled are just not cached
+            pass
+        return context
+
+    def invalidate_cache(self):
+        """
+        Discards the cached context of the pieces depending on this piece's
+        cache models.
+        """
+        invalidate_model_cache(self.get_cache_models(), self.cache_alias)
+
     def dispatch(self, context):
         return
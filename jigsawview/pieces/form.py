@@ -17,6 +17,9 @@ class FormPiece(Piece):
         """
         return self.view_name + '_form'
 
+    def get_context_names(self):
+        return [self.get_context_name()]
+
     def get_initial(self):
         """
         Returns the initial data to use for forms on this view.
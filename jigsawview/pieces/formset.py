@@ -5,10 +5,25 @@ Formset Piece
 from __future__ import unicode_literals
 
 from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router
 from django.forms.models import modelformset_factory, ModelForm
 
 
-from jigsawview.pieces.base import Piece
+from jigsawview.lazy import LazyValue
+from jigsawview.pieces.base import Piece, ignores_declaration_kwargs
+from jigsawview.utils import ClassCache, make_key
+
+
+# Formset classes generated by the ModelFormsetPieces, shared by every
+# piece with the same configuration.
+formset_cache = ClassCache()
+
+
+def clear_formset_cache():
+    """
+    Empties the generated formset classes cache.
+    """
+    formset_cache.clear()
 
 
 class FormsetPiece(Piece):
@@ -29,14 +44,50 @@ class ModelFormsetPiece(Piece):
     exclude = None
     extra = 1
     can_delete = False
+    cache_formset_factory = True
+    lazy_forms = True
 
+    @ignores_declaration_kwargs
     def __init__(self, *args, **kwargs):
         super(ModelFormsetPiece, self).__init__(*args, **kwargs)
+        self.reset_request_state()
         if not self.formset_factory:
-            self.formset_factory = modelformset_factory(self.model,
-                form=self.form_class or ModelForm,
-                fields=self.fields, exclude=self.exclude,
-                extra=self.extra, can_delete=self.can_delete)
+            self.formset_factory = self.get_formset_factory()
+
+    def reset_request_state(self):
+        self._request_queryset = None
+        self._is_valid = None
+
+    def get_cache_models(self):
+        models = super(ModelFormsetPiece, self).get_cache_models()
+        if self.model is not None and self.model not in models:
+            models += (self.model,)
+        return models
+
+    def get_formset_factory_kwargs(self):
+        """
+        Returns the keyword arguments for modelformset_factory.
+        """
+        return {
+            'form': self.form_class or ModelForm,
+            'fields': self.fields,
+            'exclude': self.exclude,
+            'extra': self.extra,
+            'can_delete': self.can_delete,
+        }
+
+    def get_formset_factory(self):
+        """
+        Returns the formset class for this piece. Classes are shared between
+        pieces with the same configuration unless cache_formset_factory
+        is False.
+        """
+        kwargs = self.get_formset_factory_kwargs()
+        if not self.cache_formset_factory:
+            return modelformset_factory(self.model, **kwargs)
+        key = make_key(self.model, kwargs)
+        return formset_cache.get(key, modelformset_factory,
+            self.model, **kwargs)
 
     def get_context_name(self):
         """
@@ -44,6 +95,9 @@ class ModelFormsetPiece(Piece):
         """
         return self.view_name + '_formset'
 
+    def get_context_names(self):
+        return [self.get_context_name()]
+
     def get_initial(self):
         """
         Returns the initial data to use for forms on this view.
@@ -67,6 +121,21 @@ class ModelFormsetPiece(Piece):
                     })
         return self.queryset._clone()
 
+    def get_request_queryset(self):
+        """
+        Returns the result of get_queryset which is only called once per
+        bound piece. Call invalidate_queryset to get it computed again.
+        """
+        if self._request_queryset is None:
+            self._request_queryset = self.get_queryset()
+        return self._request_queryset.all()
+
+    def invalidate_queryset(self):
+        """
+        Discards the queryset kept by get_request_queryset.
+        """
+        self._request_queryset = None
+
     def get_formset(self, **kwargs):
         """
         Returns an instance of the formset to be used in this view.
@@ -82,7 +151,7 @@ class ModelFormsetPiece(Piece):
         """
         args = {
             'initial': self.get_initial(),
-            'queryset': self.get_queryset(),
+            'queryset': self.get_request_queryset(),
             'prefix': self.view_name,
         }
         if self.request.method in ('POST', 'PUT'):
@@ -93,19 +162,26 @@ class ModelFormsetPiece(Piece):
         return args
 
     def get_context_data(self, context, **kwargs):
-        context[self.get_context_name()] = self.get_formset(**kwargs)
+        if self.lazy_forms:
+            formset = LazyValue(lambda: self.get_formset(**kwargs))
+        else:
+            formset = self.get_formset(**kwargs)
+        context[self.get_context_name()] = formset
         return context
 
     def formset_valid(self, formset):
         formset.save()
+        self.invalidate_cache()
         return
 
     def formset_invalid(self, formset):
         return
 
     def dispatch(self, context):
+        if self.is_safe_request():
+            return
         formset = self.get_formset()
-        if formset.is_valid():
+        if self.is_valid():
             return self.formset_valid(formset)
         else:
             return self.formset_invalid(formset)
@@ -115,14 +191,22 @@ class ModelFormsetPiece(Piece):
     #
 
     def is_valid(self):
-        return self.get_formset().is_valid()
+        """
+        Returns whether the formset is valid. The formset is only validated
+        once per request.
+        """
+        if self._is_valid is None:
+            self._is_valid = self.get_formset().is_valid()
+        return self._is_valid
 
 
 class InlineFormsetPiece(ModelFormsetPiece):
 
     root_instance = None
     fk_field = None
+    bulk_save = False
 
+    @ignores_declaration_kwargs
     def __init__(self, *args, **kwargs):
         if not self.exclude:
             self.exclude = ()
@@ -138,9 +222,81 @@ class InlineFormsetPiece(ModelFormsetPiece):
         return qs
 
     def formset_valid(self, formset):
-        objs = formset.save(commit=False)
-        for obj in objs:
-            setattr(obj, self.fk_field, self.root_instance)
-            obj.save()
-        formset.save_m2m()
+        if self.bulk_save:
+            self.bulk_save_forms(formset)
+        else:
+            objs = formset.save(commit=False)
+            for obj in objs:
+                setattr(obj, self.fk_field, self.root_instance)
+                obj.save()
+            formset.save_m2m()
+        self.invalidate_cache()
         return
+
+    def bulk_save_forms(self, formset):
+        """
+        Saves the formset objects with one query per kind of change instead
+        of one per object: a bulk_create for the new objects when
+        can_bulk_create allows it, a single DELETE for the removed ones and
+        a bulk_update for the changed ones when Django provides it (2.2+).
+        The other objects are saved one by one. The formset's save() isn't
+        used as it deletes the objects one by one on Django < 1.7.
+        """
+        deleted_forms = formset.can_delete and formset.deleted_forms or []
+        new_objs, changed_objs, deleted_pks, saved_forms = [], [], [], []
+        for form in formset.initial_forms:
+            if form in deleted_forms:
+                if form.instance.pk is not None:
+                    deleted_pks.append(form.instance.pk)
+            elif form.has_changed():
+                changed_objs.append(form.save(commit=False))
+                saved_forms.append(form)
+        for form in formset.extra_forms:
+            if form.has_changed() and form not in deleted_forms:
+                new_objs.append(form.save(commit=False))
+                saved_forms.append(form)
+        for obj in new_objs + changed_objs:
+            setattr(obj, self.fk_field, self.root_instance)
+
+        manager = self.model._default_manager
+        if deleted_pks:
+            manager.filter(pk__in=deleted_pks).delete()
+        if new_objs:
+            if self.can_bulk_create():
+                manager.bulk_create(new_objs)
+            else:
+                for obj in new_objs:
+                    obj.save()
+        if changed_objs:
+            if hasattr(manager, 'bulk_update'):
+                manager.bulk_update(changed_objs,
+                    self.get_changed_fields(saved_forms))
+            else:
+                for obj in changed_objs:
+                    obj.save()
+        for form in saved_forms:
+            form.save_m2m()
+
+    def can_bulk_create(self):
+        """
+        Returns whether the new objects can be saved with bulk_create. It
+        only sets their primary keys on the databases returning them, which
+        the many to many fields need to be saved.
+        """
+        if self.model._meta.many_to_many:
+            return False
+        connection = connections[router.db_for_write(self.model)]
+        features = connection.features
+        # Django >= 3.0, then 1.10 to 2.2
+        return getattr(features, 'can_return_rows_from_bulk_insert',
+            getattr(features, 'can_return_ids_from_bulk_insert', False))
+
+    def get_changed_fields(self, forms):
+        """
+        Returns the names of the model fields changed within the forms.
+        """
+        model_fields = set(f.name for f in self.model._meta.fields)
+        changed = set([self.fk_field])
+        for form in forms:
+            changed.update(f for f in form.changed_data if f in model_fields)
+        return sorted(changed)
@@ -4,18 +4,67 @@ Object related piece
 
 from __future__ import unicode_literals
 
-import copy
-
 from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
 from django.http import Http404
-from django.utils.translation import ugettext as _
+try:
+    from django.utils.translation import ugettext as _
+except ImportError:  # Django >= 4.0
+    from django.utils.translation import gettext as _
 from django.forms import models as model_forms
 from django.http import HttpResponseRedirect
+try:
+    from django.http import StreamingHttpResponse
+except ImportError:  # Django < 1.5
+    StreamingHttpResponse = None
 from django.core.paginator import Paginator, InvalidPage
 
+import copy
+
+import six
 import django_filters
 
-from jigsawview.pieces.base import Piece
+from django.db.models import Count, Max
+from django.db.models.query import QuerySet
+
+from jigsawview.identity import get_related_model
+from jigsawview.lazy import LazyValue
+from jigsawview.pieces.base import Piece, ignores_declaration_kwargs
+from jigsawview.pagination import KeysetPaginator
+from jigsawview.streaming import get_template, iterate, render_stream
+from jigsawview.utils import ClassCache, make_key, atomic, uses_default
+
+
+# ModelForm classes generated by ObjectPiece.get_form_class. The cache is
+# bounded so that dynamic configurations can't grow it forever.
+FORM_CLASS_CACHE_SIZE = 128
+form_class_cache = ClassCache(maxsize=FORM_CLASS_CACHE_SIZE)
+
+
+def clear_form_class_cache():
+    """
+    Empties the generated form classes cache.
+    """
+    form_class_cache.clear()
+
+
+# FilterSet classes generated from the ObjectPiece.filters declarations.
+filter_class_cache = ClassCache()
+
+
+def build_filter_class(piece_class, model, filters):
+    """
+    Creates a FilterSet class for the model and filters.
+    """
+    meta = type(str('Meta'), (object,), {
+            'model': model,
+            'fields': filters,
+        }
+    )
+    return type(
+        str('%sFilter' % piece_class.__name__),
+        (django_filters.FilterSet,), {
+        'Meta': meta,
+    })
 
 
 class ObjectPiece(Piece):
@@ -27,6 +76,11 @@ class ObjectPiece(Piece):
     slug_url_kwarg = 'slug'
     pk_url_kwarg = 'pk'
 
+    select_related = None
+    prefetch_related = None
+    only = None
+    defer = None
+
     initial = {}
     form_class = None
     success_url = None
@@ -35,7 +89,9 @@ class ObjectPiece(Piece):
     exclude = None
 
     model_form_class = model_forms.ModelForm
+    lazy_forms = True
     formfield_callback = None
+    cache_form_class = True
 
     allow_empty = True
     paginator_class = Paginator
@@ -43,27 +99,39 @@ class ObjectPiece(Piece):
     page_all_name = 'all'
     paginate_by = None
     paginate_orphans = 0
+    pagination = None
+    keyset_paginator_class = KeysetPaginator
+    keyset_field = 'pk'
+
+    # Stream the lists which aren't paginated, see jigsawview.streaming
+    streaming = False
+    streaming_chunk_size = 2000
+    streaming_content_type = None
 
     inlines = {}
+    validation_mode = 'full'
 
     filters = None
     filter_class = None
 
+    # Field holding the objects' modification date used by get_validator
+    last_modified_field = None
+
+    # Name of the view's piece holding the parent object and name of the
+    # foreign key to that object
+    parent = None
+    parent_field = None
+
+    @ignores_declaration_kwargs
     def __init__(self, *args, **kwargs):
         super(ObjectPiece, self).__init__(*args, **kwargs)
+        self.reset_request_state()
+
+    def reset_request_state(self):
         self._inlines = {}
         self._kwargs = {}
-        if self.filters and not self.filter_class:
-            meta = type(str('Meta'), (object,), {
-                    'model': self.model,
-                    'fields': self.filters,
-                }
-            )
-            self.filter_class = type(
-                str('%sFilter' % self.__class__.__name__),
-                (django_filters.FilterSet,), {
-                'Meta': meta,
-            })
+        self._request_queryset = None
+        self._is_valid = None
 
     #
     # Single object management
@@ -76,34 +144,69 @@ class ObjectPiece(Piece):
         By default this requires `self.queryset` and a `pk` or `slug` argument
         in the URLconf, but subclasses can override this to return any object.
         """
+        if queryset is None:
+            obj = self.get_chain_object(**kwargs)
+            if obj is not None:
+                return obj
+        queryset = self.get_object_queryset(queryset, **kwargs)
+        identity_map = None
+        if self.shares_object():
+            identity_map = self.get_identity_map()
+        try:
+            if identity_map is None:
+                obj = queryset.get()
+            else:
+                obj = identity_map.get_object(queryset)
+        except ObjectDoesNotExist:
+            raise self.object_not_found(queryset)
+        return obj
+
+    def shares_object(self):
+        """
+        Returns whether the piece's object can be shared with the other
+        pieces through the identity map. The object of the 'update' mode is
+        changed by its form, even when it isn't valid.
+        """
+        return self.mode != 'update'
+
+    def get_object_queryset(self, queryset=None, **kwargs):
+        """
+        Returns the queryset narrowed down to the object matching the URL
+        arguments.
+        """
         # Use a custom queryset if provided; this is required for subclasses
         # like DateDetailView
         if queryset is None:
-            queryset = self.get_queryset()
+            queryset = self.get_request_queryset()
 
+        return queryset.filter(**self.get_lookup_filters(**kwargs))
+
+    def get_lookup_filters(self, prefix='', **kwargs):
+        """
+        Returns the filters matching the object from the URL arguments,
+        for the lookup path prefix.
+        """
         # Next, try looking up by primary key.
         pk = kwargs.get(self.pk_url_kwarg, None)
         slug = kwargs.get(self.slug_url_kwarg, None)
         if pk is not None:
-            queryset = queryset.filter(pk=pk)
+            return {prefix + 'pk': pk}
 
         # Next, try looking up by slug.
         elif slug is not None:
-            slug_field = self.get_slug_field()
-            queryset = queryset.filter(**{slug_field: slug})
+            return {prefix + self.get_slug_field(): slug}
 
         # If none of those are defined, it's an error.
-        else:
-            raise AttributeError("Generic detail view %s must be called with "
-                                 "either an object pk or a slug."
-                                 % self.__class__.__name__)
+        raise AttributeError("Generic detail view %s must be called with "
+                             "either an object pk or a slug."
+                             % self.__class__.__name__)
 
-        try:
-            obj = queryset.get()
-        except ObjectDoesNotExist:
-            raise Http404(_("No %(verbose_name)s found matching the query") %
-                          {'verbose_name': queryset.model._meta.verbose_name})
-        return obj
+    def object_not_found(self, queryset):
+        """
+        Returns the Http404 exception raised when no object matches.
+        """
+        return Http404(_("No %(verbose_name)s found matching the query") %
+                       {'verbose_name': queryset.model._meta.verbose_name})
 
     def get_slug_field(self):
         """
@@ -117,6 +220,28 @@ class ObjectPiece(Piece):
         """
         return self.view_name
 
+    def get_context_names(self):
+        """
+        Returns the names this piece adds to the context in its mode.
+        """
+        name = self.get_context_object_name()
+        mode = self.mode
+        names = []
+        if mode in ('detail', 'update', 'delete'):
+            names.append(name)
+        elif mode == 'list':
+            names.extend([name + '_list', name + '_is_paginated',
+                name + '_paginator', name + '_page_obj'])
+            if hasattr(self.paginator_class, 'count_is_approximate'):
+                names.append(name + '_count_is_approximate')
+            if self.get_filter_class():
+                names.append(name + '_filters')
+        if mode in ('update', 'new'):
+            names.append(name + '_form')
+            names.extend('%s_%s_formset' % (self.view_name, inline)
+                for inline in self.inlines)
+        return names
+
     #
     # Queryset
     #
@@ -138,6 +263,213 @@ class ObjectPiece(Piece):
                     })
         return self.queryset._clone()
 
+    def get_request_queryset(self):
+        """
+        Returns the result of get_queryset which is only called once per
+        bound piece. Call invalidate_queryset to get it computed again.
+        """
+        if self._request_queryset is None:
+            self._request_queryset = self.filter_by_parent(
+                self.optimize_queryset(self.get_queryset()))
+        return self._request_queryset.all()
+
+    def invalidate_queryset(self):
+        """
+        Discards the queryset kept by get_request_queryset.
+        """
+        self._request_queryset = None
+
+    def get_mode_option(self, value):
+        """
+        Returns the value of an option for the piece's mode.
+        Options can be defined per mode with a dict, the 'default' key being
+        used for modes that aren't listed.
+        """
+        if isinstance(value, dict):
+            value = value.get(self.mode, value.get('default'))
+        if isinstance(value, six.string_types):
+            value = (value,)
+        return value
+
+    def optimize_queryset(self, queryset):
+        """
+        Applies the select_related, prefetch_related, only and defer
+        options to the queryset.
+        """
+        select_related = self.get_mode_option(self.select_related)
+        if select_related is True:
+            queryset = queryset.select_related()
+        elif select_related:
+            queryset = queryset.select_related(*select_related)
+        prefetch_related = self.get_mode_option(self.prefetch_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        only = self.get_mode_option(self.only)
+        if only:
+            queryset = queryset.only(*only)
+        defer = self.get_mode_option(self.defer)
+        if defer:
+            queryset = queryset.defer(*defer)
+        return queryset
+
+    #
+    # Parent objects
+    #
+
+    def is_object_mode(self):
+        """
+        Returns whether the piece works on a single existing object.
+        """
+        return self.mode in ('detail', 'update', 'delete')
+
+    def get_parent_piece(self):
+        """
+        Returns the view's bound parent piece or None.
+        """
+        view = getattr(self, 'view', None)
+        if not self.parent or view is None:
+            return None
+        return getattr(view, self.parent, None)
+
+    def get_chain(self):
+        """
+        Returns the ancestor pieces, closest first, whose object can be
+        fetched along with this piece's one.
+        """
+        chain = []
+        piece = self.get_parent_piece()
+        while piece is not None and piece.is_object_mode():
+            chain.append(piece)
+            piece = piece.get_parent_piece()
+        return chain
+
+    def get_chain_leaf(self):
+        """
+        Returns the deepest descendant piece working on a single object,
+        or self. When a piece has several such children, the first declared
+        one is followed. The others fetch their object on their own, which
+        get_chain_object checks against the objects of their ancestors.
+        """
+        view = self.view
+        children = view.execution_plan.children
+        leaf = self
+        while True:
+            pieces = [getattr(view, name)
+                for name in children.get(leaf.view_name, ())]
+            pieces = [piece for piece in pieces
+                if piece.is_object_mode() and piece.shares_object()]
+            if not pieces:
+                return leaf
+            leaf = pieces[0]
+
+    def get_chain_queryset(self, chain, **kwargs):
+        """
+        Returns the queryset fetching this piece's object along with the
+        chain's ones. Each ancestor's URL arguments and queryset are
+        checked within the same query.
+        """
+        queryset = self.get_object_queryset(self.get_request_queryset(),
+            **kwargs)
+        path = []
+        piece, model = self, queryset.model
+        for parent in chain:
+            parent_model = parent.get_request_queryset().model
+            piece.check_parent_field(model, parent_model)
+            model = parent_model
+            path.append(piece.parent_field)
+            prefix = '__'.join(path)
+            queryset = queryset.filter(
+                **parent.get_lookup_filters(prefix + '__', **kwargs))
+            # Restricted querysets are checked with a subquery
+            if parent.queryset is not None or not uses_default(
+                    type(parent), 'get_queryset', ObjectPiece):
+                queryset = queryset.filter(**{prefix + '__in':
+                    parent.get_request_queryset().values('pk')})
+            piece = parent
+        return queryset.select_related('__'.join(path))
+
+    def get_chain_object(self, **kwargs):
+        """
+        Returns this piece's object when it's fetched together with its
+        parents' or children's objects, None otherwise.
+        """
+        view = getattr(self, 'view', None)
+        if view is None or not self.is_object_mode():
+            return None
+        if not self.shares_object():
+            return self.get_own_chain_object(**kwargs)
+        state = view.get_request_state()
+        with state.lock:
+            objects = state.chain_objects
+            if self.view_name in objects:
+                return objects[self.view_name]
+            leaf = self.get_chain_leaf()
+            chain = leaf.get_chain()
+            if not chain:
+                return None
+            queryset = leaf.get_chain_queryset(chain, **kwargs)
+            try:
+                obj = state.identity_map.get_object(queryset)
+            except ObjectDoesNotExist:
+                raise leaf.object_not_found(queryset)
+            objects[leaf.view_name] = obj
+            piece = leaf
+            for parent in chain:
+                parent_obj = getattr(obj, piece.parent_field)
+                # The parents edited by a form fetch their own object
+                if parent.shares_object():
+                    known = objects.get(parent.view_name)
+                    if known is None:
+                        state.identity_map.add(parent_obj)
+                        objects[parent.view_name] = parent_obj
+                    elif known.pk != parent_obj.pk:
+                        raise leaf.object_not_found(queryset)
+                    else:
+                        # The children of a branch share their parent
+                        setattr(obj, piece.parent_field, known)
+                        parent_obj = known
+                obj, piece = parent_obj, parent
+            return objects.get(self.view_name)
+
+    def get_own_chain_object(self, **kwargs):
+        """
+        Returns the object of a piece which doesn't share it, checking its
+        ancestors' URL arguments, or None when the piece has no parent.
+        """
+        chain = self.get_chain()
+        if not chain:
+            return None
+        queryset = self.get_chain_queryset(chain, **kwargs)
+        try:
+            return queryset.get()
+        except ObjectDoesNotExist:
+            raise self.object_not_found(queryset)
+
+    def filter_by_parent(self, queryset):
+        """
+        Limits the lists to the objects of the parent piece's object.
+        """
+        parent = self.get_parent_piece()
+        if self.is_object_mode() or parent is None or \
+                not parent.is_object_mode():
+            return queryset
+        kwargs = getattr(self.view, 'kwargs', {})
+        parent_obj = parent.get_object(**kwargs)
+        self.check_parent_field(queryset.model, type(parent_obj))
+        return queryset.filter(**{self.parent_field: parent_obj})
+
+    def check_parent_field(self, model, parent_model):
+        """
+        Raises ImproperlyConfigured unless the parent_field of model is a
+        foreign key to the parent piece's model.
+        """
+        related = get_related_model(model._meta.get_field(self.parent_field))
+        if related is None or not issubclass(parent_model, related):
+            raise ImproperlyConfigured(
+                "%s.parent_field '%s' isn't a foreign key to %s, the model "
+                "of its parent piece '%s'." % (self.__class__.__name__,
+                    self.parent_field, parent_model.__name__, self.parent))
+
     #
     # Form management
     #
@@ -165,11 +497,19 @@ class ObjectPiece(Piece):
             else:
                 # Try to get a queryset and extract the model class
                 # from that
-                model = self.get_queryset().model
-            return model_forms.modelform_factory(model,
-                fields=self.fields, exclude=self.exclude,
-                formfield_callback=self.formfield_callback,
-                form=self.model_form_class)
+                model = self.get_request_queryset().model
+            kwargs = {
+                'fields': self.fields,
+                'exclude': self.exclude,
+                'formfield_callback': self.formfield_callback,
+                'form': self.model_form_class,
+            }
+            # Bound methods would keep this piece alive within the cache
+            if not self.cache_form_class or \
+                    getattr(self.formfield_callback, '__self__', None):
+                return model_forms.modelform_factory(model, **kwargs)
+            return form_class_cache.get(make_key(model, kwargs),
+                model_forms.modelform_factory, model, **kwargs)
 
     def get_form(self, **kwargs):
         """
@@ -178,6 +518,15 @@ class ObjectPiece(Piece):
         form_class = self.get_form_class(**kwargs)
         return form_class(**self.get_form_kwargs(**kwargs))
 
+    def get_lazy_form(self, **kwargs):
+        """
+        Returns the form, which is only built on its first use when
+        lazy_forms is True.
+        """
+        if self.lazy_forms:
+            return LazyValue(lambda: self.get_form(**kwargs))
+        return self.get_form(**kwargs)
+
     def get_form_kwargs(self, **kwargs):
         """
         Returns the keyword arguments for instanciating the form.
@@ -201,8 +550,10 @@ class ObjectPiece(Piece):
         """
         obj = form.save()
         self.object = obj
+        self.invalidate_cache()
         for inline in self._inlines.values():
             inline.root_instance = obj
+            inline.invalidate_queryset()
         return HttpResponseRedirect(self.get_success_url(obj=obj))
 
     def form_invalid(self, form):
@@ -225,6 +576,101 @@ class ObjectPiece(Piece):
                     " a get_absolute_url method on the Model.")
         return url
 
+    #
+    # Filters
+    #
+
+    def get_filter_class(self):
+        """
+        Returns the FilterSet class for this piece. When only filters is
+        defined, the class is generated once per piece class and reused.
+        """
+        if self.filter_class or not self.filters:
+            return self.filter_class
+        key = make_key(self.__class__, self.model, self.filters)
+        return filter_class_cache.get(key, build_filter_class,
+            self.__class__, self.model, self.filters)
+
+    #
+    # Cache
+    #
+
+    def is_cacheable(self):
+        """
+        Only the objects and the unfiltered lists are cached.
+        """
+        if self.mode not in ('detail', 'list') or self.get_filter_class():
+            return False
+        if self.mode == 'list' and self.streaming:
+            return False
+        return super(ObjectPiece, self).is_cacheable()
+
+    def get_cache_request_attributes(self):
+        """
+        The lists depend on the requested page number or keyset cursor.
+        """
+        attributes = super(ObjectPiece, self).get_cache_request_attributes()
+        page = 'GET.%s' % self.page_kwarg
+        if self.mode == 'list' and page not in attributes:
+            attributes += (page,)
+        return attributes
+
+    def get_cache_models(self):
+        models = super(ObjectPiece, self).get_cache_models()
+        model = self.model or self.get_request_queryset().model
+        if model not in models:
+            models += (model,)
+        return models
+
+    def get_cache_values(self, values):
+        """
+        The paginator kept in the cache doesn't hold the whole queryset
+        anymore as it would be fetched when pickled.
+        """
+        name = self.get_context_object_name()
+        paginator = values.get(name + '_paginator')
+        page = values.get(name + '_page_obj')
+        if paginator is None or page is None:
+            return values
+        paginator = copy.copy(paginator)
+        for attr in ('object_list', 'queryset'):
+            if isinstance(getattr(paginator, attr, None), QuerySet):
+                setattr(paginator, attr, getattr(paginator, attr).none())
+        page = copy.copy(page)
+        page.paginator = paginator
+        values[name + '_paginator'] = paginator
+        values[name + '_page_obj'] = page
+        return values
+
+    #
+    # Conditional responses
+    #
+
+    def get_validator(self, **kwargs):
+        """
+        Returns the modification date of the object, or the latest one and
+        the number of objects for lists, from the last_modified_field.
+        """
+        field = self.last_modified_field
+        if field is None or self.mode not in ('detail', 'delete', 'list'):
+            return None
+        queryset = self.get_request_queryset()
+        if self.mode == 'list':
+            filter_class = self.get_filter_class()
+            if filter_class:
+                queryset = filter_class(self.request.GET, queryset).qs
+            result = queryset.aggregate(last_modified=Max(field),
+                count=Count('pk'))
+            return (result['last_modified'],
+                '%(count)s:%(last_modified)s' % result)
+        queryset = self.get_object_queryset(queryset, **kwargs)
+        rows = list(queryset.values_list('pk', field)[:1])
+        if not rows:
+            # Let get_object raise the 404
+            return None
+        pk, last_modified = rows[0]
+        return (last_modified, '%s:%s' % (pk, last_modified))
+
     #
     # Pagination
     #
@@ -236,25 +682,54 @@ class ObjectPiece(Piece):
         page = self.request.GET.get(page_kwarg) or 1
         if page == self.page_all_name:
             return (None, None, queryset, False)
+        if self.pagination == 'keyset':
+            return self.paginate_queryset_by_key(queryset, page_size, page)
         paginator = self.get_paginator(
             queryset, page_size, orphans=self.get_paginate_orphans(),
             allow_empty_first_page=self.get_allow_empty())
+        page = self.get_page(paginator, self.get_page_number(paginator, page))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_page_number(self, paginator, page):
+        """
+        Returns the page number requested by the page argument.
+        """
         try:
-            page_number = int(page)
+            return int(page)
         except ValueError:
             if page == 'last':
-                page_number = paginator.num_pages
-            else:
-                raise Http404(_("Page is not 'last', nor can it be converted to an int."))
+                return paginator.num_pages
+            raise Http404(_("Page is not 'last', nor can it be converted to an int."))
+
+    def get_page(self, paginator, page_number):
+        """
+        Returns the paginator's page or raises Http404 for invalid pages.
+        """
         try:
-            page = paginator.page(page_number)
-            return (paginator, page, page.object_list, page.has_other_pages())
+            return paginator.page(page_number)
         except InvalidPage as e:
             raise Http404(_('Invalid page (%(page_number)s): %(message)s') % {
                                 'page_number': page_number,
                                 'message': str(e)
             })
 
+    def paginate_queryset_by_key(self, queryset, page_size, cursor):
+        """
+        Paginate the queryset with cursors on the keyset_field instead of
+        page numbers.
+        """
+        paginator = self.keyset_paginator_class(
+            queryset, page_size, key=self.keyset_field,
+            allow_empty_first_page=self.get_allow_empty())
+        try:
+            page = paginator.page(cursor)
+        except InvalidPage as e:
+            raise Http404(_('Invalid page (%(page_number)s): %(message)s') % {
+                                'page_number': cursor,
+                                'message': str(e)
+            })
+        return (paginator, page, page.object_list, page.has_other_pages())
+
     def get_paginate_by(self, queryset):
         """
         Get the number of items to paginate by, or ``None`` for no pagination.
@@ -284,13 +759,52 @@ class ObjectPiece(Piece):
         """
         return self.allow_empty
 
+    #
+    # Streaming
+    #
+
+    def is_streamed(self, context):
+        """
+        Returns whether the list is streamed: the streaming lists are
+        streamed unless they're paginated.
+        """
+        return self.streaming and self.mode == 'list' and \
+            context.get(self.get_context_object_name() + '_paginator') is None
+
+    def get_streaming_template_name(self, part):
+        """
+        Returns the name of the 'header', 'row' or 'footer' template.
+        """
+        return '%s_%s.html' % (self.get_template_name(), part)
+
+    def get_streaming_response(self, context):
+        """
+        Returns a response rendering the list's rows one at a time.
+        """
+        if StreamingHttpResponse is None:
+            raise ImproperlyConfigured(
+                "%s requires Django 1.5 or later to stream its list."
+                % self.__class__.__name__)
+        name = self.get_context_object_name()
+        objects = iterate(context[name + '_list'], self.streaming_chunk_size)
+        content = render_stream(self.request, context, objects, name,
+            row=get_template(self.get_streaming_template_name('row')),
+            header=get_template(self.get_streaming_template_name('header'),
+                required=False),
+            footer=get_template(self.get_streaming_template_name('footer'),
+                required=False),
+            chunk_size=self.streaming_chunk_size)
+        return StreamingHttpResponse(content,
+            content_type=self.streaming_content_type)
+
     #
     # Inlines management
     #
 
     def add_kwargs(self, **kwargs):
         super(ObjectPiece, self).add_kwargs(**kwargs)
-        self._kwargs = copy.copy(kwargs)
+        # kwargs is already a fresh dict
+        self._kwargs = kwargs
 
     def _create_inlines(self, instance=None):
         """
@@ -309,7 +823,10 @@ class ObjectPiece(Piece):
         """
         Return True if all the formsets are valid
         """
-        return all([formset.is_valid() for formset in self._inlines.values()])
+        inlines = self._inlines.values()
+        if self.validation_mode == 'fail_fast':
+            return all(inline.is_valid() for inline in inlines)
+        return all([inline.is_valid() for inline in inlines])
 
     #
     # Generic members
@@ -323,12 +840,13 @@ class ObjectPiece(Piece):
             context_object_name = self.get_context_object_name(obj)
             context[context_object_name] = obj
         elif mode == 'list':
-            objs = self.get_queryset()
+            objs = self.get_request_queryset()
             context_object_name = self.get_context_object_name()
 
             # Filters
-            if self.filter_class:
-                filters = self.filter_class(self.request.GET, self.get_queryset())
+            filter_class = self.get_filter_class()
+            if filter_class:
+                filters = filter_class(self.request.GET, objs)
                 context[context_object_name + '_filters'] = filters
                 objs = filters.qs
 
@@ -344,17 +862,20 @@ class ObjectPiece(Piece):
                 context_object_name + '_paginator': paginator,
                 context_object_name + '_page_obj': page,
             })
+            if hasattr(self.paginator_class, 'count_is_approximate'):
+                context[context_object_name + '_count_is_approximate'] = \
+                    getattr(paginator, 'count_is_approximate', False)
 
         elif mode == 'new':
             context_object_name = self.get_context_object_name()
 
         if mode == 'update':
-            form = self.get_form(instance=obj)
+            form = self.get_lazy_form(instance=obj)
             context[context_object_name + '_form'] = form
             self._form = form
             self._create_inlines(instance=obj)
         elif mode == 'new':
-            form = self.get_form()
+            form = self.get_lazy_form()
             context[context_object_name + '_form'] = form
             self._form = form
             self._create_inlines()
@@ -365,18 +886,49 @@ class ObjectPiece(Piece):
 
     def dispatch(self, context):
         if self.mode in ('update', 'new'):
+            if self.is_safe_request():
+                return
             form_name = self.get_context_object_name() + '_form'
             form = context[form_name]
+            # Using the context's form makes sure a lazy piece is computed
+            self._form = form
             if self.is_form_valid():
-                result = self.form_valid(form)
-                for inline in self._inlines.values():
-                    inline.dispatch(context)
-                return result
+                if not [inline for inline in self._inlines.values()
+                        if getattr(inline, 'bulk_save', False)]:
+                    return self.save_with_inlines(form, context)
+                # The object and its bulk saved inlines are saved together
+                with atomic():
+                    return self.save_with_inlines(form, context)
             return self.form_invalid(form)
+        if self.is_streamed(context):
+            return self.get_streaming_response(context)
         return
 
+    def save_with_inlines(self, form, context):
+        """
+        Saves the object, then its inlines.
+        """
+        result = self.form_valid(form)
+        for inline in self._inlines.values():
+            inline.dispatch(context)
+        return result
+
     def is_form_valid(self):
-        return self._form.is_valid() and self.are_formsets_valid()
+        """
+        Validates the object form and the inline formsets, once per request.
+
+        In the 'full' validation_mode, every form and formset is validated
+        so that all the errors can be displayed. In the 'fail_fast' mode,
+        validation stops at the first invalid one.
+        """
+        if self._is_valid is None:
+            if self.validation_mode == 'fail_fast':
+                self._is_valid = self._form.is_valid() and \
+                    self.are_formsets_valid()
+            else:
+                form_valid = self._form.is_valid()
+                self._is_valid = self.are_formsets_valid() and form_valid
+        return self._is_valid
 
     def get_template_name(self, *args, **kwargs):
         app_name = None
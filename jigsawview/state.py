@@ -0,0 +1,37 @@
+"""
+Objects shared by the pieces of a view during a request.
+"""
+
+from __future__ import unicode_literals
+
+import threading
+
+from jigsawview.identity import IdentityMap
+
+
+# Guards the creation of the request states by concurrent pieces
+creation_lock = threading.Lock()
+
+
+class RequestState(object):
+    """
+    The objects shared by the pieces of a view during a request: the
+    identity map and the objects fetched by the parent chains. Views only
+    create it when a piece uses them.
+    """
+
+    def __init__(self):
+        self.identity_map = IdentityMap()
+        self.chain_objects = {}
+        # Guards the objects shared by the concurrent pieces
+        self.lock = threading.RLock()
+
+
+def state_attribute(name):
+    """
+    Returns a property reading a view attribute from its request state.
+    """
+    def fget(self):
+        return getattr(self.get_request_state(), name)
+
+    return property(fget)
@@ -0,0 +1,77 @@
+"""
+Streamed rendering of the lists too large to be rendered at once.
+
+The response is built from three templates: a header and a footer rendered
+once and a row template rendered for each object. Only a chunk of the
+objects and of the rendered rows are held in memory at a time.
+"""
+
+from __future__ import unicode_literals
+
+from django.template import RequestContext, TemplateDoesNotExist, loader
+
+
+def get_template(name, required=True):
+    """
+    Returns the template with the given name. Missing optional templates
+    return None.
+    """
+    try:
+        template = loader.get_template(name)
+    except TemplateDoesNotExist:
+        if required:
+            raise
+        return None
+    # Django >= 1.8 wraps the templates of its engines
+    return getattr(template, 'template', template)
+
+
+def iterate(queryset, chunk_size):
+    """
+    Iterates over the queryset without caching its results, fetching
+    chunk_size rows at a time where the database supports it.
+    """
+    try:
+        return queryset.iterator(chunk_size=chunk_size)
+    except TypeError:  # Django < 2.0
+        return queryset.iterator()
+
+
+def render_stream(request, context, objects, object_name, row,
+                  header=None, footer=None, chunk_size=2000):
+    """
+    Yields the rendered header, rows and footer. Each row is rendered with
+    the context and the current object as object_name. The rows are
+    joined by chunks of chunk_size.
+    """
+    context = RequestContext(request, context)
+    # Django >= 1.8 runs the context processors when a template is bound
+    # to the context, which is only done once here
+    bind_template = getattr(context, 'bind_template', None)
+    if bind_template is not None:
+        with bind_template(row):
+            for chunk in render_chunks(context, objects, object_name, row,
+                                       header, footer, chunk_size):
+                yield chunk
+    else:
+        for chunk in render_chunks(context, objects, object_name, row,
+                                   header, footer, chunk_size):
+            yield chunk
+
+
+def render_chunks(context, objects, object_name, row, header, footer,
+                  chunk_size):
+    if header is not None:
+        yield header.render(context)
+    rows = []
+    for obj in objects:
+        context.update({object_name: obj})
+        rows.append(row.render(context))
+        context.pop()
+        if len(rows) >= chunk_size:
+            yield ''.join(rows)
+            rows = []
+    if rows:
+        yield ''.join(rows)
+    if footer is not None:
+        yield footer.render(context)
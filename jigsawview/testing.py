@@ -0,0 +1,94 @@
+"""
+Test helpers for the projects using jigsawview.
+"""
+
+from __future__ import unicode_literals
+
+import six
+
+from django.db.models.query import QuerySet
+from django.test import RequestFactory
+
+from jigsawview.instrumentation import QueryCounter
+
+
+OBJECT_MODES = ('detail', 'update', 'delete')
+
+
+def evaluate(value):
+    """
+    Runs the queries a template would run to display the value: querysets
+    are fetched and forms or formsets rendered.
+    """
+    if hasattr(value, 'is_bound'):
+        six.text_type(value)
+    elif isinstance(value, QuerySet):
+        list(value)
+
+
+class QueryCountTestMixin(object):
+    """
+    TestCase mixin checking that the number of queries a view runs doesn't
+    depend on the number of rows in the database, which catches the N+1
+    queries issues.
+
+    The view runs once per size in query_count_sizes, after create_rows was
+    called with that size. The responses are rendered and every value of
+    the context is evaluated.
+    """
+
+    query_count_sizes = (1, 10)
+
+    def count_view_queries(self, view, request, **kwargs):
+        """
+        Returns the number of queries and the response for a request.
+        """
+        with QueryCounter() as counter:
+            response = view(request, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            context = getattr(response, 'context_data', None) or {}
+            for value in context.values():
+                evaluate(value)
+        return counter.queries, response
+
+    def assertConstantQueries(self, view, create_rows, method='get',
+                              path='/', data=None, sizes=None, **kwargs):
+        """
+        Fails when the view doesn't run the same number of queries for each
+        size. Returns that number of queries.
+        """
+        factory = RequestFactory()
+        counts = []
+        for size in sizes or self.query_count_sizes:
+            create_rows(size)
+            if method == 'post':
+                request = factory.post(path, data or {})
+            else:
+                request = factory.get(path, data or {})
+            queries, response = self.count_view_queries(view, request,
+                **kwargs)
+            counts.append((size, queries))
+        if len(set(queries for size, queries in counts)) > 1:
+            self.fail('The number of queries depends on the number of rows: '
+                '%s.' % ', '.join('%s queries for %s rows' % (queries, size)
+                    for size, queries in counts))
+        return counts[0][1]
+
+    def assertModesConstantQueries(self, view_class, create_rows,
+                                   modes=('list', 'detail', 'update', 'new',
+                                          'delete'),
+                                   object_kwargs=None, **kwargs):
+        """
+        Runs assertConstantQueries for each mode of a JigsawView. The
+        object modes receive the object_kwargs URL arguments.
+        Returns a dict of the modes to their number of queries.
+        """
+        result = {}
+        for mode in modes:
+            mode_kwargs = dict(kwargs)
+            if mode in OBJECT_MODES:
+                mode_kwargs.update(object_kwargs or {})
+            result[mode] = self.assertConstantQueries(
+                view_class.as_view(mode=mode), create_rows, **mode_kwargs)
+        return result
@@ -0,0 +1,83 @@
+"""
+Tests of the asynchronous views, which require Python 3.6+ and Django 4.1+.
+
+Run them with: python runtests.py jigsawview.tests.async_tests
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.test import RequestFactory, TestCase
+
+from jigsawview.async_views import AsyncJigsawView, AsyncObjectPiece
+from jigsawview.tests.models import MyObjectModel, MyInlineModel
+
+
+class AsyncChainedObjectView(AsyncJigsawView):
+    obj = AsyncObjectPiece(model=MyObjectModel)
+    inline = AsyncObjectPiece(model=MyInlineModel, pk_url_kwarg='inline_pk',
+        parent='obj', parent_field='root_obj')
+
+
+class AsyncChainedListView(AsyncJigsawView):
+    obj = AsyncObjectPiece(model=MyObjectModel)
+    inline = AsyncObjectPiece(model=MyInlineModel, mode='list', requires=(),
+        parent='obj', parent_field='root_obj')
+
+
+class AsyncInstrumentedView(AsyncJigsawView):
+    obj = AsyncObjectPiece(model=MyObjectModel)
+    inline = AsyncObjectPiece(model=MyInlineModel, mode='list', requires=())
+    server_timing = True
+
+
+class AsyncParentPieceTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    async def get_context(self, view, mode='detail', **kwargs):
+        request = RequestFactory().get('/')
+        response = await view.as_view(mode=mode)(request, **kwargs)
+        return response.context_data
+
+    async def test_object_outside_of_its_parent(self):
+        with self.assertRaises(Http404):
+            await self.get_context(AsyncChainedObjectView, pk=2, inline_pk=1)
+        context = await self.get_context(AsyncChainedObjectView,
+            pk=1, inline_pk=1)
+        self.assertEqual(context['inline'].pk, 1)
+        self.assertTrue(context['inline'].root_obj is context['obj'])
+
+    async def test_lists_are_limited_to_the_parent_object(self):
+        context = await self.get_context(AsyncChainedListView, pk=1)
+        self.assertEqual([o.pk async for o in context['inline_list']], [1])
+        context = await self.get_context(AsyncChainedListView, pk=2)
+        self.assertEqual([o.pk async for o in context['inline_list']], [])
+
+
+class AsyncInstrumentationTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    async def test_measures(self):
+        from jigsawview.instrumentation import request_measured
+        received = []
+
+        def receiver(sender, measures, **kwargs):
+            received.append([(m.piece, m.phase, m.queries)
+                for m in measures])
+
+        request = RequestFactory().get('/')
+        response = await AsyncInstrumentedView.as_view(mode='detail')(
+            request, pk=1)
+        self.assertFalse(response.is_rendered)
+        response.template_name = 'tests/obj_detail.html'
+        request_measured.connect(receiver)
+        try:
+            response = await sync_to_async(response.render)()
+        finally:
+            request_measured.disconnect(receiver)
+        measures = received[0]
+        self.assertTrue(('obj', 'context', 1) in measures)
+        self.assertTrue(('inline', 'dispatch', 0) in measures)
+        self.assertEqual(measures[-1], (None, 'render', 0))
+        self.assertTrue('obj.context;dur=' in response['Server-Timing'])
@@ -5,11 +5,15 @@ Models for the jigsawview tests.
 from __future__ import unicode_literals
 
 from django.db import models
+try:
+    from django.urls import reverse
+except ImportError:  # Django < 1.10
+    from django.core.urlresolvers import reverse
 try:
     from django.utils.encoding import python_2_unicode_compatible
-except:
-    def python_2_unicode_compatible():
-        return
+except ImportError:  # Django >= 3.0
+    def python_2_unicode_compatible(klass):
+        return klass
 
 
 @python_2_unicode_compatible
@@ -23,9 +27,8 @@ class MyObjectModel(models.Model):
     def __str__(self):
         return '%i' % (self.id,)
 
-    @models.permalink
     def get_absolute_url(self):
-        return ('object_detail', (), {'pk': self.id})
+        return reverse('object_detail', kwargs={'pk': self.id})
 
 
 @python_2_unicode_compatible
@@ -39,5 +42,10 @@ class MyOtherObjectModel(models.Model):
 
 class MyInlineModel(models.Model):
 
-    root_obj = models.ForeignKey(MyObjectModel)
+    root_obj = models.ForeignKey(MyObjectModel, on_delete=models.CASCADE)
     my_data = models.CharField(max_length=32)
+
+
+class MyDatedModel(models.Model):
+    name = models.CharField(max_length=16)
+    updated_at = models.DateTimeField()
@@ -0,0 +1,2364 @@
+"""
+Unit tests for the jigsawview application
+"""
+from __future__ import unicode_literals
+
+import base64
+import datetime
+import sys
+import six
+
+from mock import Mock
+
+import django
+
+from django.test import TestCase, TransactionTestCase
+from django.test import RequestFactory
+
+from django import forms
+from django.db.models import Count
+
+
+from jigsawview.pieces import Piece, FormPiece, ModelFormsetPiece, ObjectPiece
+from jigsawview.pieces.formset import clear_formset_cache
+from jigsawview.pieces.object import clear_form_class_cache
+from jigsawview.utils import ClassCache
+from jigsawview.lazy import LazyValue, is_evaluated
+from jigsawview.pagination import CountlessPaginator, CachedCountPaginator
+from jigsawview.views import JigsawView
+from jigsawview.testing import QueryCountTestMixin
+
+from jigsawview.tests.models import (MyObjectModel, MyOtherObjectModel,
+    MyInlineModel, MyDatedModel)
+from jigsawview.tests.views import MyObjectPiece, MyRootPiece, FilterPiece
+from jigsawview.tests.views import MyInlinePiece, MyOtherObjectPiece
+from jigsawview.tests.views import ObjectView
+
+# The asynchronous views require Python 3.6+ and Django 4.1+
+if sys.version_info >= (3, 6) and django.VERSION >= (4, 1):
+    from jigsawview.tests.async_tests import (AsyncParentPieceTest,
+        AsyncInstrumentationTest)
+
+#
+# Various test Pieces and View definitions
+#
+
+
+class MyPiece1(Piece):
+    template_name_prefix = 'my_piece'
+
+    def get_context_data(self, context, *args, **kwargs):
+        context['my_piece_1'] = 'azerty'
+        return context
+
+
+class MyPiece2(Piece):
+    pass
+
+
+class DiscardContextPiece(Piece):
+    def get_context_data(self, context, *args, **kwargs):
+        return {}
+
+
+class ContextDependsOnModePiece(Piece):
+    def get_context_data(self, context, *args, **kwargs):
+        context.update({
+            self.mode: True,
+        })
+        return context
+
+
+class MyView1(JigsawView):
+    piece1 = MyPiece1()
+    piece2 = MyPiece2()
+
+
+class MyView2(JigsawView):
+    piece2 = MyPiece2()
+    piece1 = MyPiece1()
+
+
+class MySubView(MyView1):
+    piece3 = MyPiece1()
+
+
+class MySubView2(MyView2):
+    piece3 = MyPiece1()
+
+
+class MySubSubView(MySubView):
+    piece4 = MyPiece2()
+
+
+class MyView4(JigsawView):
+    piece1 = MyPiece1(default_mode='list')
+
+
+class DiscardContextView(MyView1):
+    discard_context_piece = DiscardContextPiece()
+
+
+class ContextDependsOnModeView(MyView1):
+    mode_dependant_context = ContextDependsOnModePiece()
+
+
+#
+# TESTS FOR THE PIECE IN VIEWS - ORDERING, TYPES...
+#
+
+
+class TestJigsawViewPiece(TestCase):
+
+    def test_two_Piece_instances_have_different_creation_counter(self):
+        piece1 = MyPiece1()
+        piece2 = MyPiece2()
+        piece1b = MyPiece1()
+        self.assertEqual(piece1.creation_counter + 1, piece2.creation_counter)
+        self.assertEqual(piece2.creation_counter + 1, piece1b.creation_counter)
+
+    def test_view_keep_pieces_ordered(self):
+        self.assertEqual(list(MyView1.base_pieces.keys()), ['piece1', 'piece2'])
+        self.assertEqual(list(MyView2.base_pieces.keys()), ['piece2', 'piece1'])
+
+    def test_base_pieces(self):
+        self.assertEqual(list(MySubView.base_pieces.keys()), ['piece3'])
+        self.assertEqual(list(MySubView2.base_pieces.keys()), ['piece3'])
+
+    def test_view_keep_pieces_ordered_when_subclassed(self):
+        self.assertEqual(
+            list(MySubView.pieces.keys()),
+            ['piece1', 'piece2', 'piece3']
+        )
+        self.assertEqual(
+            list(MySubView2.pieces.keys()),
+            ['piece2', 'piece1', 'piece3']
+        )
+
+    def test_pieces_are_inherited_from_every_ancestor(self):
+        self.assertEqual(list(MySubSubView.pieces.keys()),
+            ['piece1', 'piece2', 'piece3', 'piece4'])
+        self.assertEqual(list(MySubSubView.base_pieces.keys()), ['piece4'])
+        view = MySubSubView(mode='detail')
+        self.assertTrue(view.piece1.inherited_piece)
+        self.assertTrue(view.piece3.inherited_piece)
+        self.assertFalse(view.piece4.inherited_piece)
+
+    def test_changing_the_instance_pieces_does_not_affect_the_class(self):
+        view = MyView1(mode='detail')
+        self.assertEqual(list(view.pieces.keys()), ['piece1', 'piece2'])
+        from django.utils.datastructures import SortedDict
+        view.pieces = SortedDict()
+        self.assertEqual(list(view.pieces.keys()), [])
+        self.assertEqual(list(MyView1.base_pieces.keys()), ['piece1', 'piece2'])
+
+    def test_binding_uses_the_declaration_class(self):
+        unbound = MyPiece1(template_name='azerty')
+        piece = unbound(view_mode='detail', view_name='piece')
+        self.assertTrue(isinstance(piece, MyPiece1))
+        self.assertTrue(type(piece) is unbound.bound_cls)
+        self.assertEqual(piece.template_name, 'azerty')
+        self.assertEqual(piece.creation_counter, unbound.creation_counter)
+        self.assertFalse('template_name' in piece.__dict__)
+
+    def test_init_overrides_get_the_declaration_kwargs(self):
+        class InitPiece(MyPiece1):
+            def __init__(self, *args, **kwargs):
+                self.init_kwargs = sorted(kwargs)
+                super(InitPiece, self).__init__(*args, **kwargs)
+
+        piece = InitPiece(template_name='azerty')(view_mode='detail')
+        self.assertEqual(piece.init_kwargs,
+            ['bound', 'template_name', 'view_mode'])
+        self.assertEqual(piece.template_name, 'azerty')
+        piece = MyPiece1(template_name='azerty')(view_mode='detail')
+        self.assertFalse('template_name' in piece.__dict__)
+
+    def test_init_overrides_are_found_by_their_marker(self):
+        class ThirdPartyPiece(MyPiece1):
+            def __init__(self, *args, **kwargs):
+                self.init_kwargs = sorted(kwargs)
+                super(ThirdPartyPiece, self).__init__(*args, **kwargs)
+        ThirdPartyPiece.__module__ = 'jigsawview.pieces.thirdparty'
+
+        piece = ThirdPartyPiece(template_name='azerty')(view_mode='detail')
+        self.assertEqual(piece.init_kwargs,
+            ['bound', 'template_name', 'view_mode'])
+
+    def test_declared_functions_are_not_bound(self):
+        def callback(field):
+            return field
+        piece = MyPiece1(formfield_callback=callback)(view_mode='detail')
+        self.assertEqual(piece.formfield_callback('field'), 'field')
+
+    def test_execution_plan(self):
+        plan = MySubView2.execution_plan
+        self.assertEqual(plan.piece_names, ('piece2', 'piece1', 'piece3'))
+        self.assertEqual(plan.context_order, (0, 1, 2))
+        self.assertEqual(plan.dispatch_order, (2, 1, 0))
+        self.assertEqual(plan.kwargs_order, (2, 1, 0))
+
+    def test_view_orders_bound_pieces_from_the_plan(self):
+        view = MySubView2(mode='detail')
+        self.assertEqual(view._context_pieces,
+            (view.piece2, view.piece1, view.piece3))
+        self.assertEqual(view._dispatch_pieces,
+            (view.piece3, view.piece1, view.piece2))
+
+    def test_use_view_mode_by_default(self):
+        # When the piece is part of the class
+        piece1 = MyPiece1(bound=True, view_mode='detail', inherited_piece=False)
+        self.assertEqual(piece1.mode, 'detail')
+        # When the piece in inherited
+        piece1 = MyPiece1(bound=True, view_mode='detail', inherited_piece=True)
+        self.assertEqual(piece1.mode, 'detail')
+
+    def test_piece_mode_takes_over_view_mode(self):
+        # When the piece is part of the class
+        piece1 = MyPiece1(bound=True, mode='list', view_mode='detail', inherited_piece=False)
+        self.assertEqual(piece1.mode, 'list')
+        # When the piece in inherited
+        piece1 = MyPiece1(bound=True, mode='list', view_mode='detail', inherited_piece=True)
+        self.assertEqual(piece1.mode, 'list')
+
+    def test_piece_default_mode_is_overriden_if_piece_is_not_inherited(self):
+        piece1 = MyPiece1(bound=True, default_mode='list', view_mode='detail', inherited_piece=False)
+        self.assertEqual(piece1.mode, 'detail')
+
+    def test_piece_default_mode_is_overriden_by_view_mode_if_piece_is_not_inherited(self):
+        piece1 = MyPiece1(bound=True, default_mode='list', view_mode='detail', inherited_piece=True)
+        self.assertEqual(piece1.mode, 'list')
+
+
+class TestJigsawTemplateRendering(TestCase):
+
+    def setUp(self):
+        self.template_strings = {
+            'name': 'some_template_nam.html',
+            'prefix': 'a_prefix_'
+        }
+
+    def test_template_name(self):
+        template_name = self.template_strings['name']
+        view = MyView1(mode='detail')
+        view.template_name = template_name
+        result = view.get_template_name()
+        self.assertEqual(result, template_name)
+
+    def test_template_name_preceed_template_prefix_or_pieces(self):
+        template_name = self.template_strings['name']
+        template_prefix = self.template_strings['prefix']
+        view = MyView1(mode='list')
+        view.template_name = template_name
+        view.template_name_prefix = template_prefix
+        result = view.get_template_name()
+        self.assertEqual(result, template_name)
+
+    def test_template_prefix(self):
+        template_prefix = self.template_strings['prefix']
+
+        view = MyView1(mode='list')
+        view.template_name_prefix = template_prefix
+        result = view.get_template_name()
+        self.assertEqual(result, template_prefix + 'list.html')
+
+        view = MyView1(mode='detail')
+        view.template_name_prefix = template_prefix
+        result = view.get_template_name()
+        self.assertEqual(result, template_prefix + 'detail.html')
+
+    def test_use_not_null_piece_template_name(self):
+        view = MyView1(mode='list')
+        self.assertEqual(
+            view.get_template_name(),
+            'my_piece_list.html')
+
+        view = MyView1(mode='detail')
+        self.assertEqual(
+            view.get_template_name(),
+            'my_piece_detail.html')
+
+        view = MyView2(mode='list')
+        self.assertEqual(
+            view.get_template_name(),
+            'my_piece_list.html')
+
+    def test_basic_context(self):
+        view = MyView1(mode='detail')
+        self.assertEqual(
+            view.get_context_data({}), {
+                'my_piece_1': 'azerty',
+        })
+        view = MyView2(mode='detail')
+        self.assertEqual(
+            view.get_context_data({}), {
+                'my_piece_1': 'azerty',
+        })
+
+    def test_get_context_data_can_discard_context_data(self):
+        view = DiscardContextView(mode='detail')
+        self.assertEqual(view.get_context_data({}), {})
+
+    def test_get_context_data_can_depend_on_mode(self):
+        view = ContextDependsOnModeView(mode='list')
+        self.assertEqual(view.get_context_data({}), {
+            'list': True,
+            'my_piece_1': 'azerty',
+        })
+        view = ContextDependsOnModeView(mode='detail')
+        self.assertEqual(view.get_context_data({}), {
+            'detail': True,
+            'my_piece_1': 'azerty',
+        })
+
+
+#
+# JIGSAW VIEW TESTS
+#
+
+
+class JigsawViewTest(TestCase):
+
+    fixtures = ['object_piece.json']
+    urls = 'jigsawview.tests.urls'
+
+    def test_make_sure_set_mode_is_called_on_pieces(self):
+        view = ObjectView(mode='new')
+        self.assertEqual(view.obj.mode, 'new')
+        self.assertEqual(view.other.mode, 'list')
+
+    def test_detail_view_context(self):
+        response = self.client.get('/object/1/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response=response,
+            template_name='tests/obj_detail.html')
+        self.assertEqual(
+            sorted(response.context_data.keys()),
+            sorted(['obj', 'other_paginator', 'other_page_obj',
+                'other_is_paginated', 'other_list'
+            ]))
+        self.assertEqual(
+            response.context_data['obj'],
+            MyObjectModel.objects.get(id=1)
+        )
+        self.assertEqual(
+            [(o.id, type(o)) for o in response.context_data['other_list']],
+            [(o.id, type(o)) for o in MyOtherObjectModel.objects.all()]
+        )
+
+    def test_list_view_context(self):
+        response = self.client.get('/objects/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response=response,
+            template_name='tests/obj_list.html')
+        self.assertEqual(
+            sorted(response.context_data.keys()),
+            sorted([
+                'obj_paginator', 'obj_page_obj',
+                'obj_is_paginated', 'obj_list',
+                'other_paginator', 'other_page_obj',
+                'other_is_paginated', 'other_list',
+            ]))
+        self.assertEqual(
+            [(o.id, type(o)) for o in response.context_data['obj_list']],
+            [(o.id, type(o)) for o in MyObjectModel.objects.all()]
+        )
+        self.assertEqual(
+            [(o.id, type(o)) for o in response.context_data['other_list']],
+            [(o.id, type(o)) for o in MyOtherObjectModel.objects.all()]
+        )
+
+    def test_update_view_context(self):
+        response = self.client.get('/object/1/update/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response=response,
+            template_name='tests/obj_update.html')
+        self.assertEqual(
+            sorted(response.context_data.keys()),
+            sorted([
+                'obj_form', 'obj',
+                'other_paginator', 'other_page_obj',
+                'other_is_paginated', 'other_list',
+            ]))
+        self.assertEqual(
+            [(o.id, type(o)) for o in response.context_data['other_list']],
+            [(o.id, type(o)) for o in MyOtherObjectModel.objects.all()]
+        )
+        new_values = {
+            'slug': 'new_slug_value',
+            'other_slug_field': 'other_slug_value',
+        }
+        response = self.client.post('/object/1/update/', new_values)
+        self.assertRedirects(response, '/object/1/',
+            target_status_code=200)
+        obj = MyObjectModel.objects.get(id=1)
+        for k, v in new_values.items():
+            self.assertEqual(getattr(obj, k), v)
+
+    def test_failing_update_view_context(self):
+        response = self.client.get('/object/1/update/')
+        new_values = {
+            'slug': 'new_slug_value',
+        }
+        response = self.client.post('/object/1/update/', new_values)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response=response,
+            template_name='tests/obj_update.html')
+        self.assertFormError(response, 'obj_form', 'other_slug_field', 'This field is required.')
+
+    def test_new_view(self):
+        response = self.client.get('/object/new/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response=response,
+            template_name='tests/obj_new.html')
+        self.assertEqual(
+            sorted(response.context_data.keys()),
+            sorted([
+                'obj_form',
+                'other_paginator', 'other_page_obj',
+                'other_is_paginated', 'other_list',
+            ]))
+        self.assertEqual(
+            [(o.id, type(o)) for o in response.context_data['other_list']],
+            [(o.id, type(o)) for o in MyOtherObjectModel.objects.all()]
+        )
+        new_values = {
+            'slug': 'new_slug_value',
+            'other_slug_field': 'other_slug_value',
+        }
+        response = self.client.post('/object/new/', new_values)
+        self.assertRedirects(response, '/object/3/',
+            target_status_code=200)
+        obj = MyObjectModel.objects.get(id=3)
+        for k, v in new_values.items():
+            self.assertEqual(getattr(obj, k), v)
+
+    def test_new_view_with_inline(self):
+        response = self.client.get('/inlines/new/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response=response,
+            template_name='tests/obj_new.html')
+        self.assertEqual(
+            sorted(response.context_data.keys()),
+            sorted(['obj_form', 'obj_data_formset']))
+        new_values = {
+            'slug': 'new_slug_value',
+            'other_slug_field': 'other_slug_value',
+            'obj_data-TOTAL_FORMS': '1',
+            'obj_data-INITIAL_FORMS': '0',
+            'obj_data-MAX_NUM_FORMS': '',
+            'obj_data-0-my_data': 'qwerty',
+            'obj_data-0-id': '',
+        }
+        response = self.client.post('/inlines/new/', new_values)
+        self.assertRedirects(response, '/object/3/',
+            target_status_code=200)
+        obj = MyObjectModel.objects.get(id=3)
+        for key in ('slug', 'other_slug_field'):
+            value = new_values[key]
+            self.assertEqual(getattr(obj, key), value)
+        self.assertEqual(obj.myinlinemodel_set.count(), 1)
+
+    def test_update_view_with_inline(self):
+        response = self.client.get('/inlines/1/update/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response=response,
+            template_name='tests/obj_update.html')
+        self.assertEqual(
+            sorted(response.context_data.keys()),
+            sorted(['obj', 'obj_form', 'obj_data_formset']))
+        inline = response.context_data['obj_data_formset']
+        self.assertEqual(len(inline), 2)
+        self.assertEqual(inline[0]['my_data'].value(), 'azerty')
+
+        new_values = {
+            'slug': 'new_slug_value',
+            'other_slug_field': 'other_slug_value',
+            'obj_data-TOTAL_FORMS': '2',
+            'obj_data-INITIAL_FORMS': '1',
+            'obj_data-MAX_NUM_FORMS': '',
+            'obj_data-0-my_data': 'qwerty',
+            'obj_data-0-id': '1',
+        }
+        response = self.client.post('/inlines/1/update/', new_values)
+        self.assertRedirects(response, '/object/1/',
+            target_status_code=200)
+        obj = MyObjectModel.objects.get(id=1)
+        for key in ('slug', 'other_slug_field'):
+            value = new_values[key]
+            self.assertEqual(getattr(obj, key), value)
+        self.assertEqual(obj.myinlinemodel_set.count(), 1)
+        self.assertEqual(obj.myinlinemodel_set.all()[0].my_data, 'qwerty')
+
+#
+# OBJECT PIECE TESTS
+#
+
+
+class ObjectPieceTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def test_get_object_with_no_arguments_raises_an_exception(self):
+        object_view = MyObjectPiece(bound=True, mode='detail')
+        with self.assertRaises(AttributeError):
+            object_view.get_object(request=Mock(), context={})
+
+    def test_get_object_by_pk(self):
+        object_view = MyObjectPiece(bound=True, mode='detail')
+        obj = object_view.get_object(request=Mock(), context={}, pk='1')
+        self.assertTrue(isinstance(obj, MyObjectModel))
+        self.assertEqual(obj.id, 1)
+
+    def test_get_object_with_different_pk(self):
+        object_view = MyObjectPiece(bound=True, mode='detail')
+        object_view.pk_url_kwarg = 'obj_id'
+        obj = object_view.get_object(request=Mock(), context={}, obj_id='1')
+        self.assertTrue(isinstance(obj, MyObjectModel))
+        self.assertEqual(obj.id, 1)
+
+    def test_get_object_by_slug(self):
+        object_view = MyObjectPiece(bound=True, mode='detail')
+        obj = object_view.get_object(request=Mock(), context={}, slug='object_1')
+        self.assertTrue(isinstance(obj, MyObjectModel))
+        self.assertEqual(obj.id, 1)
+
+    def test_get_object_by_custom_url_slug(self):
+        object_view = MyObjectPiece(bound=True, mode='detail')
+        object_view.slug_url_kwarg = "name"
+        obj = object_view.get_object(request=Mock(), context={}, name='object_1')
+        self.assertTrue(isinstance(obj, MyObjectModel))
+        self.assertEqual(obj.id, 1)
+
+    def test_get_object_by_custom_slug_field(self):
+        object_view = MyObjectPiece(bound=True, mode='detail')
+        object_view.slug_field = "other_slug_field"
+        object_view.slug_url_kwarg = "name"
+        obj = object_view.get_object(request=Mock(), context={}, name='other_object_1')
+        self.assertTrue(isinstance(obj, MyObjectModel))
+        self.assertEqual(obj.id, 1)
+
+    def test_get_context_data_in_detail_mode(self):
+        rf = RequestFactory()
+        object_piece = MyObjectPiece(bound=True, mode='detail')
+        object_piece.view_name = 'my_object'
+        object_piece.add_kwargs(request=rf.get('object/1/'))
+        context = {'demo': True}
+        context = object_piece.get_context_data(context, pk=1)
+        self.assertEqual(len(context), 2)
+        # Test the previous context wasn't discarded
+        self.assertTrue('demo' in context)
+        self.assertEqual(context['demo'], True)
+        # Test the context addition
+        self.assertTrue('my_object' in context)
+        self.assertEqual(context['my_object'].id, 1)
+
+    def test_get_context_data_in_list_mode(self):
+        rf = RequestFactory()
+        object_piece = MyObjectPiece(bound=True, mode='list')
+        object_piece.view_name = 'my_object'
+        object_piece.add_kwargs(request=rf.get('objects'))
+        context = {'demo': True}
+        context = object_piece.get_context_data(context)
+        self.assertEqual(len(context), 5)
+        # Test the previous context wasn't discarded
+        self.assertTrue('demo' in context)
+        self.assertEqual(context['demo'], True)
+        # Test the context addition
+        self.assertTrue('my_object_list' in context)
+        self.assertEqual(len(context['my_object_list']), 2)
+        self.assertTrue('my_object_is_paginated' in context)
+        self.assertTrue('my_object_page_obj' in context)
+        self.assertTrue('my_object_paginator' in context)
+
+    def test_get_context_data_in_update_mode(self):
+        rf = RequestFactory()
+        object_piece = MyObjectPiece(bound=True, mode='update')
+        object_piece.view_name = 'my_object'
+        object_piece.add_kwargs(request=rf.get('object/1/update/'))
+        context = {'demo': True}
+        context = object_piece.get_context_data(context, pk=1)
+        self.assertEqual(len(context), 3)
+        # Test the previous context wasn't discarded
+        self.assertTrue('demo' in context)
+        self.assertEqual(context['demo'], True)
+        # Test the context addition
+        self.assertTrue('my_object' in context)
+        self.assertEqual(context['my_object'].id, 1)
+        self.assertTrue('my_object_form' in context)
+        self.assertEqual(
+            sorted(context['my_object_form'].fields.keys()),
+            sorted(['slug', 'other_slug_field'])
+        )
+        self.assertEqual(
+            context['my_object_form']['slug'].value(),
+            'object_1')
+        self.assertEqual(
+            context['my_object_form']['other_slug_field'].value(),
+            'other_object_1')
+
+    def test_get_context_data_in_new_mode(self):
+        rf = RequestFactory()
+        object_piece = MyObjectPiece(bound=True, mode='new')
+        object_piece.view_name = 'my_object'
+        object_piece.add_kwargs(request=rf.get('object/new/'))
+        context = {'demo': True}
+        context = object_piece.get_context_data(context)
+        self.assertEqual(len(context), 2)
+        # Test the previous context wasn't discarded
+        self.assertTrue('demo' in context)
+        self.assertEqual(context['demo'], True)
+        # Test the context addition
+        self.assertTrue('my_object_form' in context)
+        self.assertEqual(
+            sorted(context['my_object_form'].fields.keys()),
+            sorted(['slug', 'other_slug_field'])
+        )
+        self.assertEqual(
+            context['my_object_form']['slug'].value(),
+            None)
+        self.assertEqual(
+            context['my_object_form']['other_slug_field'].value(),
+            None)
+
+
+class FormClassCacheTest(TestCase):
+
+    def setUp(self):
+        clear_form_class_cache()
+
+    def test_form_class_is_shared_between_pieces(self):
+        piece1 = MyObjectPiece(bound=True, mode='new')
+        piece2 = MyObjectPiece(bound=True, mode='new')
+        self.assertTrue(piece1.get_form_class() is piece2.get_form_class())
+
+    def test_form_class_depends_on_the_configuration(self):
+        piece1 = MyObjectPiece(bound=True, mode='new')
+        piece2 = MyObjectPiece(bound=True, mode='new', fields=['slug'])
+        self.assertFalse(piece1.get_form_class() is piece2.get_form_class())
+        self.assertEqual(
+            list(piece2.get_form_class().base_fields.keys()), ['slug'])
+
+    def test_form_class_cache_can_be_disabled(self):
+        piece = MyObjectPiece(bound=True, mode='new', cache_form_class=False)
+        self.assertFalse(piece.get_form_class() is piece.get_form_class())
+
+    def test_class_cache_evicts_least_recently_used(self):
+        cache = ClassCache(maxsize=2)
+        cache.get('a', lambda: 'A')
+        cache.get('b', lambda: 'B')
+        cache.get('a', lambda: 'A2')
+        cache.get('c', lambda: 'C')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a', lambda: 'A3'), 'A')
+        self.assertEqual(cache.get('b', lambda: 'B2'), 'B2')
+
+
+class ObjectPieceWithInlinesTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def test_get_context_with_inlines_in_new_mode(self):
+        rf = RequestFactory()
+        object_piece = MyRootPiece(bound=True, mode='new')
+        object_piece.view_name = 'root'
+        object_piece.add_kwargs(request=rf.get('object/new/'))
+        context = {'demo': True}
+        context = object_piece.get_context_data(context)
+        self.assertEqual(len(context), 3)
+        # Test the previous context wasn't discarded
+        self.assertTrue('demo' in context)
+        self.assertEqual(context['demo'], True)
+        # Test the root object form
+        self.assertEqual(object_piece._inlines['data'].mode, 'new')
+        self.assertTrue('root_form' in context)
+        self.assertEqual(
+            sorted(context['root_form'].fields.keys()),
+            sorted(['slug', 'other_slug_field'])
+        )
+        # Test the inline form
+        self.assertTrue('root_data_formset' in context)
+        inline = context['root_data_formset']
+        from django.forms.models import BaseModelFormSet
+        self.assertTrue(isinstance(inline, BaseModelFormSet))
+        # Make sure the FK isn't part of the formset
+        self.assertFalse('root_obj' in inline[0].fields.keys())
+        self.assertTrue('my_data' in inline[0].fields.keys())
+
+    def test_get_context_with_inlines_in_update_mode(self):
+        rf = RequestFactory()
+        object_piece = MyRootPiece(bound=True, mode='update')
+        object_piece.view_name = 'root'
+        object_piece.add_kwargs(request=rf.get('object/1/update/'))
+        context = {'demo': True}
+        context = object_piece.get_context_data(context, pk=1)
+        self.assertEqual(len(context), 4)
+        # Test the previous context wasn't discarded
+        self.assertTrue('demo' in context)
+        self.assertEqual(context['demo'], True)
+        # Test the root object form
+        self.assertTrue('root_form' in context)
+        self.assertEqual(
+            sorted(context['root_form'].fields.keys()),
+            sorted(['slug', 'other_slug_field'])
+        )
+        # Test the inline form
+        self.assertEqual(object_piece._inlines['data'].mode, 'update')
+        self.assertTrue(object_piece._inlines['data'].root_instance)
+        self.assertTrue('root_data_formset' in context)
+        inline = context['root_data_formset']
+        from django.forms.models import BaseModelFormSet
+        self.assertTrue(isinstance(inline, BaseModelFormSet))
+        self.assertEqual(
+            sorted(inline[0].fields.keys()),
+            sorted(['my_data', 'id'])
+        )
+        self.assertEqual(len(inline), 2)
+        self.assertEqual(
+            inline[0]['id'].value(),
+            1)
+        self.assertEqual(
+            inline[0]['my_data'].value(),
+            'azerty')
+
+
+#
+# FORM PIECE TESTS
+#
+
+class TestForm(forms.Form):
+    name = forms.CharField(max_length=32)
+    description = forms.CharField(max_length=32)
+
+
+class MyFormPiece(FormPiece):
+    form_class = TestForm
+
+    def __init__(self, *args, **kwargs):
+        super(MyFormPiece, self).__init__(*args, **kwargs)
+        self.form_is_valid = False
+        self.form_is_invalid = False
+
+    def form_valid(self, form):
+        self.form_is_valid = True
+
+    def form_invalid(self, form):
+        self.form_is_invalid = True
+
+
+class FormPieceTest(TestCase):
+
+    def test_form_in_context(self):
+        rf = RequestFactory()
+        form_piece = MyFormPiece(bound=True, mode='detail')
+        form_piece.view_name = 'login'
+        form_piece.add_kwargs(request=rf.get('login/'))
+        context = form_piece.get_context_data({'demo': True})
+        self.assertEqual(len(context), 2)
+        # Test the previous context wasn't discarded
+        self.assertTrue('demo' in context)
+        self.assertEqual(context['demo'], True)
+        # Test the form is here
+        self.assertTrue('login_form' in context)
+        self.assertTrue(isinstance(context['login_form'], forms.Form))
+
+    def test_valid_form(self):
+        rf = RequestFactory()
+        form_piece = MyFormPiece(bound=True, mode='detail')
+        form_piece.view_name = 'login'
+        form_piece.add_kwargs(request=rf.post('login/', {
+            'name': 'Xavier Ordoquy',
+            'description': 'Django and Python developer',
+        }))
+        context = form_piece.get_context_data({'demo': True})
+        form_piece.dispatch(context)
+        self.assertTrue(form_piece.form_is_valid)
+        self.assertFalse(form_piece.form_is_invalid)
+
+    def test_invalid_form(self):
+        rf = RequestFactory()
+        form_piece = MyFormPiece(bound=True, mode='detail')
+        form_piece.view_name = 'login'
+        form_piece.add_kwargs(request=rf.post('login/', {
+            'name': 'Xavier Ordoquy',
+        }))
+        context = form_piece.get_context_data({'demo': True})
+        form_piece.dispatch(context)
+        self.assertFalse(form_piece.form_is_valid)
+        self.assertTrue(form_piece.form_is_invalid)
+        self.assertEqual(context['login_form'].errors, {
+            'description': ['This field is required.'],
+        })
+
+
+#
+# FORMSET TESTS
+#
+
+
+class MyFormsetPiece(ModelFormsetPiece):
+    model = MyObjectModel
+
+    def __init__(self, *args, **kwargs):
+        super(MyFormsetPiece, self).__init__(*args, **kwargs)
+        self.formset_is_valid = False
+        self.formset_is_invalid = False
+
+    def formset_valid(self, formset):
+        self.formset_is_valid = True
+        super(MyFormsetPiece, self).formset_valid(formset)
+
+    def formset_invalid(self, formset):
+        self.formset_is_invalid = True
+        super(MyFormsetPiece, self).formset_invalid(formset)
+
+
+class ModelFormsetPieceTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def test_formset_in_context(self):
+        rf = RequestFactory()
+        formset_piece = MyFormsetPiece(bound=True, mode='new')
+        formset_piece.view_name = 'bugs'
+        formset_piece.add_kwargs(request=rf.get('demo/'))
+        context = formset_piece.get_context_data({'demo': True})
+        self.assertEqual(len(context), 2)
+        # Test the previous context wasn't discarded
+        self.assertTrue('demo' in context)
+        self.assertEqual(context['demo'], True)
+        # Test the form is here
+        self.assertTrue('bugs_formset' in context)
+        formset = context['bugs_formset']
+        from django.forms.models import BaseModelFormSet
+        self.assertTrue(isinstance(formset, BaseModelFormSet))
+        self.assertEqual(formset.total_form_count(), 3)  # 2 instances + 1 empty
+
+    def test_valid_formset(self):
+        rf = RequestFactory()
+        self.assertEqual(len(MyObjectModel.objects.all()), 2)
+        formset_piece = MyFormsetPiece(bound=True, mode='new')
+        formset_piece.view_name = 'bugs'
+        formset_piece.add_kwargs(request=rf.post('demo/', {
+            'bugs-TOTAL_FORMS': '3',
+            'bugs-INITIAL_FORMS': '2',
+            'bugs-0-slug': 'object_1',
+            'bugs-0-other_slug_field': 'other_object_1',
+            'bugs-0-id': '1',
+            'bugs-1-slug': 'modified_2',
+            'bugs-1-other_slug_field': 'other_modified_2',
+            'bugs-1-id': '2',
+            'bugs-2-slug': 'object_3',
+            'bugs-2-other_slug_field': 'other_object_3',
+        }))
+        context = formset_piece.get_context_data({'demo': True})
+        formset_piece.dispatch(context)
+
+        self.assertTrue(formset_piece.formset_is_valid)
+        self.assertFalse(formset_piece.formset_is_invalid)
+
+        self.assertEqual(len(MyObjectModel.objects.all()), 3)
+        objs = MyObjectModel.objects.all().order_by('id')
+        self.assertEqual(objs[0].slug, 'object_1')
+        self.assertEqual(objs[0].other_slug_field, 'other_object_1')
+        self.assertEqual(objs[1].slug, 'modified_2')
+        self.assertEqual(objs[1].other_slug_field, 'other_modified_2')
+        self.assertEqual(objs[2].slug, 'object_3')
+        self.assertEqual(objs[2].other_slug_field, 'other_object_3')
+
+    def test_invalid_formset(self):
+        rf = RequestFactory()
+        self.assertEqual(len(MyObjectModel.objects.all()), 2)
+        formset_piece = MyFormsetPiece(bound=True, mode='new')
+        formset_piece.view_name = 'bugs'
+        formset_piece.add_kwargs(request=rf.post('demo/', {
+            'bugs-TOTAL_FORMS': '3',
+            'bugs-INITIAL_FORMS': '2',
+            'bugs-0-slug': 'object_1',
+            'bugs-0-other_slug_field': 'other_object_1',
+            'bugs-0-id': '1',
+            'bugs-1-slug': 'modified_2',
+            'bugs-1-other_slug_field': '',
+            'bugs-1-id': '2',
+            'bugs-2-slug': '',
+            'bugs-2-other_slug_field': 'other_object_3',
+        }))
+        context = formset_piece.get_context_data({'demo': True})
+        formset_piece.dispatch(context)
+
+        self.assertFalse(formset_piece.formset_is_valid)
+        self.assertTrue(formset_piece.formset_is_invalid)
+
+        self.assertEqual(len(MyObjectModel.objects.all()), 2)
+        objs = MyObjectModel.objects.all().order_by('id')
+        self.assertEqual(objs[0].slug, 'object_1')
+        self.assertEqual(objs[0].other_slug_field, 'other_object_1')
+        self.assertEqual(objs[1].slug, 'object_2')
+        self.assertEqual(objs[1].other_slug_field, 'other_object_2')
+
+        formset = context['bugs_formset']
+        self.assertEqual(formset[0].errors, {})
+        self.assertEqual(formset[1].errors, {
+            'other_slug_field': ['This field is required.'],
+        })
+        self.assertEqual(formset[2].errors, {
+            'slug': ['This field is required.'],
+        })
+
+
+class FormsetCacheTest(TestCase):
+
+    def setUp(self):
+        clear_formset_cache()
+
+    def test_formset_class_is_shared_between_pieces(self):
+        piece1 = MyFormsetPiece(bound=True, mode='new')
+        piece2 = MyFormsetPiece(bound=True, mode='new')
+        self.assertTrue(piece1.formset_factory is piece2.formset_factory)
+
+    def test_formset_class_depends_on_the_configuration(self):
+        piece1 = MyFormsetPiece(bound=True, mode='new')
+        piece2 = MyFormsetPiece(bound=True, mode='new', extra=3)
+        self.assertFalse(piece1.formset_factory is piece2.formset_factory)
+        self.assertEqual(piece2.formset_factory.extra, 3)
+
+    def test_formset_cache_can_be_disabled(self):
+        piece1 = MyFormsetPiece(bound=True, mode='new')
+        piece2 = MyFormsetPiece(bound=True, mode='new',
+            cache_formset_factory=False)
+        self.assertFalse(piece1.formset_factory is piece2.formset_factory)
+
+    def test_clear_formset_cache(self):
+        piece1 = MyFormsetPiece(bound=True, mode='new')
+        clear_formset_cache()
+        piece2 = MyFormsetPiece(bound=True, mode='new')
+        self.assertFalse(piece1.formset_factory is piece2.formset_factory)
+
+
+class FiltersTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def test_filters_are_in_context(self):
+        rf = RequestFactory()
+        object_piece = FilterPiece(bound=True, mode='list')
+        object_piece.view_name = 'my_object'
+        object_piece.add_kwargs(request=rf.get('objects'))
+        context = {'demo': True}
+        context = object_piece.get_context_data(context)
+        self.assertEqual(len(context), 6)
+        # Test the previous context wasn't discarded
+        self.assertTrue('demo' in context)
+        self.assertEqual(context['demo'], True)
+        # Test the context addition
+        self.assertTrue('my_object_list' in context)
+        self.assertEqual(len(context['my_object_list']), 2)
+        self.assertTrue('my_object_is_paginated' in context)
+        self.assertTrue('my_object_page_obj' in context)
+        self.assertTrue('my_object_paginator' in context)
+        self.assertTrue('my_object_filters' in context)
+        self.assertTrue(context['my_object_filters'])
+        # TODO: tester les valeurs du filtre
+        self.assertTrue('slug' in context['my_object_filters'].filters)
+        self.assertTrue(context['my_object_filters'].filters['slug'])
+
+    def test_filter_class_is_built_once(self):
+        piece1 = FilterPiece(bound=True, mode='list')
+        piece2 = FilterPiece(bound=True, mode='list')
+        self.assertTrue(piece1.get_filter_class())
+        self.assertTrue(
+            piece1.get_filter_class() is piece2.get_filter_class())
+
+    def test_filter_class_takes_over_filters(self):
+        piece = FilterPiece(bound=True, mode='list', filter_class=Mock)
+        self.assertTrue(piece.get_filter_class() is Mock)
+
+
+class KeysetPaginationTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def get_context(self, url, **kwargs):
+        object_piece = FilterPiece(bound=True, mode='list', paginate_by=1,
+            pagination='keyset', **kwargs)
+        object_piece.view_name = 'my_object'
+        object_piece.add_kwargs(request=RequestFactory().get(url))
+        return object_piece.get_context_data({})
+
+    def test_first_page(self):
+        context = self.get_context('objects')
+        self.assertEqual([o.id for o in context['my_object_list']], [1])
+        page = context['my_object_page_obj']
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+        self.assertTrue(context['my_object_is_paginated'])
+
+    def test_next_and_previous_pages(self):
+        context = self.get_context('objects')
+        cursor = context['my_object_page_obj'].next_page_number()
+        context = self.get_context('objects?page=%s' % cursor)
+        self.assertEqual([o.id for o in context['my_object_list']], [2])
+        page = context['my_object_page_obj']
+        self.assertFalse(page.has_next())
+        self.assertTrue(page.has_previous())
+        context = self.get_context(
+            'objects?page=%s' % page.previous_page_number())
+        self.assertEqual([o.id for o in context['my_object_list']], [1])
+
+    def test_last_page_with_descending_key(self):
+        context = self.get_context('objects?page=last', keyset_field='-pk')
+        self.assertEqual([o.id for o in context['my_object_list']], [1])
+        self.assertFalse(context['my_object_page_obj'].has_next())
+
+    def test_works_with_filters(self):
+        context = self.get_context('objects?slug=object_2')
+        self.assertEqual([o.id for o in context['my_object_list']], [2])
+        self.assertFalse(context['my_object_is_paginated'])
+
+    def test_invalid_cursor(self):
+        from django.http import Http404
+        with self.assertRaises(Http404):
+            self.get_context('objects?page=azerty')
+        # A well formed cursor holding a value of the wrong type
+        cursor = base64.urlsafe_b64encode(b'n:abc').decode('ascii')
+        with self.assertRaises(Http404):
+            self.get_context('objects?page=%s' % cursor.rstrip('='))
+
+
+class CountlessPaginationTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def get_context(self, url):
+        object_piece = MyObjectPiece(bound=True, mode='list', paginate_by=1,
+            paginator_class=CountlessPaginator)
+        object_piece.view_name = 'my_object'
+        object_piece.add_kwargs(request=RequestFactory().get(url))
+        return object_piece.get_context_data({})
+
+    def test_pages_do_not_count_rows(self):
+        with self.assertNumQueries(1):
+            context = self.get_context('objects')
+            self.assertEqual([o.id for o in context['my_object_list']], [1])
+        page = context['my_object_page_obj']
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+        self.assertEqual(page.end_index(), 1)
+        self.assertFalse(context['my_object_count_is_approximate'])
+        with self.assertNumQueries(1):
+            self.assertEqual(context['my_object_paginator'].count, 2)
+            self.assertEqual(context['my_object_paginator'].num_pages, 2)
+
+    def test_last_page(self):
+        context = self.get_context('objects?page=2')
+        self.assertEqual([o.id for o in context['my_object_list']], [2])
+        self.assertFalse(context['my_object_page_obj'].has_next())
+        with self.assertNumQueries(0):
+            self.assertEqual(context['my_object_paginator'].count, 2)
+        self.assertFalse(context['my_object_count_is_approximate'])
+
+    def test_out_of_range_page(self):
+        from django.http import Http404
+        with self.assertRaises(Http404):
+            self.get_context('objects?page=3')
+
+
+class CachedCountPaginationTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_count_is_cached(self):
+        queryset = MyObjectModel.objects.filter(slug__startswith='object')
+        paginator = CachedCountPaginator(queryset, 1)
+        self.assertEqual(paginator.count, 2)
+        self.assertFalse(paginator.count_is_approximate)
+        paginator = CachedCountPaginator(queryset.all(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 2)
+        self.assertTrue(paginator.count_is_approximate)
+        self.assertEqual(paginator.num_pages, 2)
+
+    def test_count_depends_on_the_query(self):
+        paginator = CachedCountPaginator(MyObjectModel.objects.all(), 1)
+        self.assertEqual(paginator.count, 2)
+        paginator = CachedCountPaginator(
+            MyObjectModel.objects.filter(slug='object_1'), 1)
+        self.assertEqual(paginator.count, 1)
+        self.assertFalse(paginator.count_is_approximate)
+
+    def test_count_depends_on_the_query_parameters(self):
+        paginator = CachedCountPaginator(MyObjectModel.objects.filter(
+            slug__in=['object_1', 'object_2']), 1)
+        self.assertEqual(paginator.count, 2)
+        paginator = CachedCountPaginator(MyObjectModel.objects.filter(
+            slug__in=['object_1, object_2']), 1)
+        self.assertEqual(paginator.count, 0)
+
+    def test_count_cache_alias(self):
+        from django.core.cache import cache
+        from mock import patch
+        with patch('jigsawview.pagination.get_cache',
+                Mock(return_value=cache)) as get_cache:
+            paginator = CachedCountPaginator(MyObjectModel.objects.all(), 1,
+                count_cache_alias='counts')
+            self.assertEqual(paginator.count, 2)
+        get_cache.assert_called_with('counts')
+
+    def test_count_is_approximate_in_the_context(self):
+        def get_context():
+            object_piece = MyObjectPiece(bound=True, mode='list',
+                paginate_by=1, paginator_class=CachedCountPaginator)
+            object_piece.view_name = 'my_object'
+            object_piece.add_kwargs(request=RequestFactory().get('objects'))
+            return object_piece.get_context_data({})
+
+        self.assertFalse(get_context()['my_object_count_is_approximate'])
+        self.assertTrue(get_context()['my_object_count_is_approximate'])
+
+
+class CountingFilterPiece(FilterPiece):
+
+    def __init__(self, *args, **kwargs):
+        super(CountingFilterPiece, self).__init__(*args, **kwargs)
+        self.get_queryset_calls = 0
+
+    def get_queryset(self):
+        self.get_queryset_calls += 1
+        return super(CountingFilterPiece, self).get_queryset()
+
+
+class RequestQuerysetTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def test_get_queryset_is_called_once_with_filters(self):
+        object_piece = CountingFilterPiece(bound=True, mode='list')
+        object_piece.view_name = 'my_object'
+        object_piece.add_kwargs(request=RequestFactory().get('objects'))
+        context = object_piece.get_context_data({})
+        self.assertEqual(len(context['my_object_list']), 2)
+        self.assertEqual(object_piece.get_queryset_calls, 1)
+
+    def test_get_queryset_is_shared_by_object_and_form(self):
+        object_piece = CountingFilterPiece(bound=True, mode='update',
+            model=None, queryset=MyObjectModel.objects.all())
+        object_piece.view_name = 'my_object'
+        object_piece.add_kwargs(request=RequestFactory().get('object/1/'))
+        object_piece.get_context_data({}, pk=1)
+        self.assertEqual(object_piece.get_queryset_calls, 1)
+
+    def test_invalidate_queryset(self):
+        object_piece = CountingFilterPiece(bound=True, mode='list')
+        object_piece.get_request_queryset()
+        object_piece.get_request_queryset()
+        self.assertEqual(object_piece.get_queryset_calls, 1)
+        object_piece.invalidate_queryset()
+        object_piece.get_request_queryset()
+        self.assertEqual(object_piece.get_queryset_calls, 2)
+
+
+class QuerysetOptionsTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def get_context(self, mode='list', **kwargs):
+        object_piece = MyObjectPiece(bound=True, mode=mode, **kwargs)
+        object_piece.view_name = 'my_object'
+        object_piece.add_kwargs(request=RequestFactory().get('objects'))
+        return object_piece.get_context_data({}, pk=1)
+
+    def test_select_related(self):
+        context = self.get_context(model=MyInlineModel,
+            select_related=('root_obj',))
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                [o.root_obj.slug for o in context['my_object_list']],
+                ['object_1'])
+
+    def test_prefetch_related(self):
+        context = self.get_context(prefetch_related='myinlinemodel_set')
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                [len(o.myinlinemodel_set.all())
+                    for o in context['my_object_list']],
+                [1, 0])
+
+    def test_options_per_mode(self):
+        options = {
+            'only': {'list': ('slug',)},
+            'defer': {'default': ('slug',), 'list': None},
+        }
+        obj = self.get_context(**options)['my_object_list'][0]
+        self.assertTrue('slug' in obj.__dict__)
+        self.assertFalse('other_slug_field' in obj.__dict__)
+        obj = self.get_context(mode='detail', **options)['my_object']
+        self.assertFalse('slug' in obj.__dict__)
+        self.assertTrue('other_slug_field' in obj.__dict__)
+
+
+class BulkInlinePiece(MyInlinePiece):
+    bulk_save = True
+    can_delete = True
+
+
+class BulkRootPiece(MyRootPiece):
+    inlines = {
+        'data': BulkInlinePiece(),
+    }
+
+
+class BulkInlineSaveTest(TestCase):
+
+    fixtures = ['object_piece.json']
+    urls = 'jigsawview.tests.urls'
+
+    def dispatch(self, data, queries):
+        """
+        Dispatches the update and checks the number of queries the inlines
+        are saved with.
+        """
+        object_piece = BulkRootPiece(bound=True, mode='update')
+        object_piece.view_name = 'root'
+        object_piece.add_kwargs(
+            request=RequestFactory().post('object/1/update/', data))
+        context = object_piece.get_context_data({}, pk=1)
+        bulk_save_forms = BulkInlinePiece.bulk_save_forms
+        test = self
+
+        def counted_bulk_save_forms(piece, formset):
+            with test.assertNumQueries(queries):
+                bulk_save_forms(piece, formset)
+
+        from mock import patch
+        with patch.object(BulkInlinePiece, 'bulk_save_forms',
+                counted_bulk_save_forms):
+            return object_piece.dispatch(context)
+
+    def test_new_inlines_are_bulk_created(self):
+        data = {
+            'slug': 'object_1',
+            'other_slug_field': 'other_object_1',
+            'root_data-TOTAL_FORMS': '3',
+            'root_data-INITIAL_FORMS': '1',
+            'root_data-MAX_NUM_FORMS': '',
+            'root_data-0-my_data': 'azerty',
+            'root_data-0-id': '1',
+            'root_data-1-my_data': 'qwerty',
+            'root_data-1-id': '',
+            'root_data-2-my_data': 'dvorak',
+            'root_data-2-id': '',
+        }
+        from mock import Mock, patch
+        with patch.object(BulkInlinePiece, 'can_bulk_create',
+                Mock(return_value=True)):
+            with patch.object(MyInlineModel, 'save',
+                    side_effect=AssertionError('save() called')):
+                response = self.dispatch(data, queries=1)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            sorted(MyInlineModel.objects.filter(root_obj=1)
+                .values_list('my_data', flat=True)),
+            ['azerty', 'dvorak', 'qwerty'])
+
+    def test_new_inlines_are_saved_without_returned_pks(self):
+        data = {
+            'slug': 'object_1',
+            'other_slug_field': 'other_object_1',
+            'root_data-TOTAL_FORMS': '3',
+            'root_data-INITIAL_FORMS': '1',
+            'root_data-MAX_NUM_FORMS': '',
+            'root_data-0-my_data': 'azerty',
+            'root_data-0-id': '1',
+            'root_data-1-my_data': 'qwerty',
+            'root_data-1-id': '',
+            'root_data-2-my_data': 'dvorak',
+            'root_data-2-id': '',
+        }
+        saved = []
+        save = MyInlineModel.save
+
+        def recorded_save(obj, *args, **kwargs):
+            save(obj, *args, **kwargs)
+            saved.append(obj)
+
+        from mock import Mock, patch
+        with patch.object(BulkInlinePiece, 'can_bulk_create',
+                Mock(return_value=False)):
+            with patch.object(MyInlineModel, 'save', recorded_save):
+                response = self.dispatch(data, queries=2)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            sorted((obj.pk, obj.my_data) for obj in saved),
+            sorted(MyInlineModel.objects.exclude(pk=1)
+                .values_list('pk', 'my_data')))
+        self.assertEqual(len(saved), 2)
+
+    def test_deleted_inlines_use_a_single_query(self):
+        from mock import patch
+        for my_data in ('qwerty', 'dvorak'):
+            MyInlineModel.objects.create(root_obj_id=1, my_data=my_data)
+        data = {
+            'slug': 'object_1',
+            'other_slug_field': 'other_object_1',
+            'root_data-TOTAL_FORMS': '3',
+            'root_data-INITIAL_FORMS': '3',
+            'root_data-MAX_NUM_FORMS': '',
+            'root_data-0-my_data': 'azerty',
+            'root_data-0-id': '1',
+            'root_data-1-my_data': 'qwerty',
+            'root_data-1-id': '2',
+            'root_data-1-DELETE': 'on',
+            'root_data-2-my_data': 'dvorak',
+            'root_data-2-id': '3',
+            'root_data-2-DELETE': 'on',
+        }
+        with patch.object(MyInlineModel, 'delete',
+                side_effect=AssertionError('delete() called')):
+            response = self.dispatch(data, queries=1)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(MyInlineModel.objects.values_list('my_data', flat=True)),
+            ['azerty'])
+
+    def test_bulk_save_updates_and_deletes(self):
+        import django
+        MyInlineModel.objects.create(root_obj_id=1, my_data='qwerty')
+        data = {
+            'slug': 'object_1',
+            'other_slug_field': 'other_object_1',
+            'root_data-TOTAL_FORMS': '2',
+            'root_data-INITIAL_FORMS': '2',
+            'root_data-MAX_NUM_FORMS': '',
+            'root_data-0-my_data': 'modified',
+            'root_data-0-id': '1',
+            'root_data-1-my_data': 'qwerty',
+            'root_data-1-id': '2',
+            'root_data-1-DELETE': 'on',
+        }
+        # One DELETE and one UPDATE, Django < 1.6 checks the row exists
+        # before updating it
+        queries = django.VERSION < (1, 6) and 3 or 2
+        response = self.dispatch(data, queries=queries)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(MyInlineModel.objects.values_list('my_data', flat=True)),
+            ['modified'])
+
+
+class ValidationTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    data = {
+        'slug': 'object_1',
+        'root_data-TOTAL_FORMS': '1',
+        'root_data-INITIAL_FORMS': '1',
+        'root_data-MAX_NUM_FORMS': '',
+        'root_data-0-my_data': '',
+        'root_data-0-id': '1',
+    }
+
+    def get_piece(self, **kwargs):
+        object_piece = MyRootPiece(bound=True, mode='update', **kwargs)
+        object_piece.view_name = 'root'
+        object_piece.add_kwargs(
+            request=RequestFactory().post('object/1/update/', self.data))
+        return object_piece
+
+    def test_full_validation_reports_every_error(self):
+        object_piece = self.get_piece()
+        context = object_piece.get_context_data({}, pk=1)
+        self.assertEqual(object_piece.dispatch(context), None)
+        self.assertTrue(context['root_form'].errors)
+        self.assertTrue(context['root_data_formset'].errors[0])
+
+    def test_fail_fast_validation_stops_at_the_first_error(self):
+        object_piece = self.get_piece(validation_mode='fail_fast')
+        context = object_piece.get_context_data({}, pk=1)
+        self.assertFalse(object_piece.is_form_valid())
+        self.assertEqual(context['root_data_formset']._errors, None)
+
+    def test_forms_are_validated_once(self):
+        object_piece = self.get_piece()
+        context = object_piece.get_context_data({}, pk=1)
+        form = context['root_form']
+        form.is_valid = Mock(return_value=False)
+        self.assertFalse(object_piece.is_form_valid())
+        self.assertFalse(object_piece.is_form_valid())
+        object_piece.dispatch(context)
+        self.assertEqual(form.is_valid.call_count, 1)
+
+
+class LazyFormsTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def get_context(self, **kwargs):
+        object_piece = MyRootPiece(bound=True, mode='update', **kwargs)
+        object_piece.view_name = 'root'
+        object_piece.add_kwargs(request=RequestFactory().get('object/1/'))
+        return object_piece.get_context_data({}, pk=1)
+
+    def test_forms_are_built_on_first_access(self):
+        with self.assertNumQueries(1):
+            context = self.get_context()
+        self.assertFalse(is_evaluated(context['root_form']))
+        self.assertFalse(is_evaluated(context['root_data_formset']))
+        self.assertEqual(context['root_form']['slug'].value(), 'object_1')
+        self.assertTrue(is_evaluated(context['root_form']))
+        with self.assertNumQueries(1):
+            self.assertEqual(len(context['root_data_formset']), 2)
+        self.assertTrue(isinstance(context['root_form'], forms.ModelForm))
+
+    def test_lazy_forms_can_be_disabled(self):
+        context = self.get_context(lazy_forms=False)
+        self.assertTrue(is_evaluated(context['root_form']))
+
+    def test_safe_requests_build_no_form(self):
+        class FormsView(JigsawView):
+            obj = MyRootPiece()
+            bugs = MyFormsetPiece()
+
+        from mock import patch
+        form_class = Mock()
+        formset_factory = Mock()
+        view = FormsView.as_view(mode='update')
+        with patch.object(MyRootPiece, 'get_form_class',
+                Mock(return_value=form_class)):
+            with patch.object(MyInlinePiece, 'formset_factory',
+                    formset_factory):
+                with patch.object(MyFormsetPiece, 'formset_factory',
+                        formset_factory):
+                    for method in ('get', 'head', 'options'):
+                        request = getattr(RequestFactory(), method)(
+                            'object/1/update/')
+                        response = view(request, pk=1)
+                        self.assertEqual(response.status_code, 200)
+        self.assertFalse(form_class.called)
+        self.assertFalse(formset_factory.called)
+
+
+class LazyValueTest(TestCase):
+
+    def test_falsy_values(self):
+        for value in (False, None, 0, ''):
+            lazy = LazyValue(lambda: value)
+            self.assertFalse(lazy)
+            self.assertTrue(is_evaluated(lazy))
+        self.assertTrue(LazyValue(lambda: 1))
+
+
+class LazyPiecesView(JigsawView):
+    sidebar = MyOtherObjectPiece(mode='list', lazy=True)
+    obj = MyObjectPiece(lazy=True)
+
+
+class LazyPiecesTest(TestCase):
+
+    fixtures = ['object_piece.json']
+    urls = 'jigsawview.tests.urls'
+
+    def get_view(self, mode, request):
+        view = LazyPiecesView(mode=mode)
+        for piece in view._kwargs_pieces:
+            piece.add_kwargs(request=request)
+        return view
+
+    def test_lazy_pieces_are_computed_on_first_access(self):
+        request = RequestFactory().get('/object/1/')
+        view = self.get_view('detail', request)
+        with self.assertNumQueries(0):
+            context = view.get_context_data(request, pk=1)
+        self.assertEqual(sorted(context.keys()), sorted([
+            'obj', 'sidebar_list', 'sidebar_is_paginated',
+            'sidebar_paginator', 'sidebar_page_obj']))
+        with self.assertNumQueries(1):
+            self.assertEqual([o.id for o in context['sidebar_list']], [3, 4])
+            self.assertFalse(context['sidebar_is_paginated'])
+        with self.assertNumQueries(1):
+            self.assertEqual(context['obj'].id, 1)
+
+    def test_lazy_piece_dispatch(self):
+        request = RequestFactory().post('/object/1/update/', {
+            'slug': 'new_slug',
+            'other_slug_field': 'other_slug',
+        })
+        view = self.get_view('update', request)
+        response = view.dispatch(request, pk=1)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(MyObjectModel.objects.get(id=1).slug, 'new_slug')
+
+    def test_pieces_without_context_names_can_not_be_lazy(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        class BadLazyView(JigsawView):
+            piece1 = MyPiece1(lazy=True)
+
+        with self.assertRaises(ImproperlyConfigured):
+            BadLazyView(mode='detail').get_context_data({})
+
+
+class ProviderPiece(Piece):
+    provides = ('answer',)
+
+    def get_context_data(self, context, *args, **kwargs):
+        context['answer'] = 42
+        return context
+
+
+class ConsumerPiece(Piece):
+    requires = ('answer', 'provider')
+
+    def get_context_data(self, context, *args, **kwargs):
+        context['consumer'] = context['answer'] + 1
+        return context
+
+
+class DependenciesView(JigsawView):
+    piece1 = MyPiece1()
+    consumer = ConsumerPiece()
+    provider = ProviderPiece(requires=())
+
+
+class PieceDependenciesTest(TestCase):
+
+    def test_dependencies(self):
+        plan = DependenciesView.execution_plan
+        self.assertEqual(list(plan.dependencies.items()), [
+            ('piece1', ()),
+            ('consumer', ('provider',)),
+            ('provider', ()),
+        ])
+
+    def test_context_follows_the_dependencies(self):
+        plan = DependenciesView.execution_plan
+        self.assertEqual(plan.context_order, (0, 2, 1))
+        self.assertEqual(plan.dispatch_order, (2, 1, 0))
+        context = DependenciesView(mode='detail').get_context_data({})
+        self.assertEqual(context['consumer'], 43)
+
+    def test_pieces_without_requirements_keep_declaration_order(self):
+        self.assertEqual(list(MySubView.execution_plan.dependencies.items()), [
+            ('piece1', ()),
+            ('piece2', ('piece1',)),
+            ('piece3', ('piece1', 'piece2')),
+        ])
+
+    def test_piece_names_are_provided(self):
+        class View(JigsawView):
+            obj = MyObjectPiece(requires=())
+            obj_data = MyObjectPiece(requires=('obj_list',))
+            other = MyObjectPiece(requires=('obj_data_form',))
+        self.assertEqual(View.execution_plan.dependencies['obj_data'],
+            ('obj',))
+        self.assertEqual(View.execution_plan.dependencies['other'],
+            ('obj_data',))
+
+    def test_missing_requirement(self):
+        from django.core.exceptions import ImproperlyConfigured
+        with self.assertRaises(ImproperlyConfigured):
+            class View(JigsawView):
+                consumer = ConsumerPiece()
+
+    def test_circular_dependencies(self):
+        from django.core.exceptions import ImproperlyConfigured
+        with self.assertRaises(ImproperlyConfigured):
+            class View(JigsawView):
+                first = MyPiece1(requires=('second',))
+                second = MyPiece1(requires=('first',))
+
+
+class WaitingPiece(Piece):
+    """
+    Waits for the SignalingPiece which is declared after it.
+    """
+    requires = ()
+
+    def get_context_data(self, context, *args, **kwargs):
+        context['waited'] = self.view.event.wait(5) or False
+        return context
+
+
+class SignalingPiece(Piece):
+    requires = ()
+
+    def get_context_data(self, context, *args, **kwargs):
+        self.view.event.set()
+        context['signaled'] = True
+        return context
+
+
+class ConcurrentView(JigsawView):
+    concurrent_pieces = True
+    piece1 = MyPiece1(requires=())
+    waiting = WaitingPiece()
+    signaling = SignalingPiece()
+    consumer = ConsumerPiece()
+    provider = ProviderPiece(requires=())
+
+    def __init__(self, **kwargs):
+        super(ConcurrentView, self).__init__(**kwargs)
+        import threading
+        self.event = threading.Event()
+
+
+class ConcurrentPiecesTest(TransactionTestCase):
+
+    def test_context_levels(self):
+        self.assertEqual(ConcurrentView.execution_plan.context_levels,
+            ((0, 1, 2, 4), (3,)))
+
+    def test_independent_pieces_run_concurrently(self):
+        from jigsawview.concurrency import futures
+        if futures is None:
+            return
+        context = ConcurrentView(mode='detail').get_context_data({})
+        self.assertEqual(context, {
+            'my_piece_1': 'azerty',
+            'waited': True,
+            'signaled': True,
+            'answer': 42,
+            'consumer': 43,
+        })
+
+
+class ConcurrentObjectsView(JigsawView):
+    concurrent_pieces = True
+    instrument = True
+    obj = MyObjectPiece(requires=())
+    other = MyOtherObjectPiece(mode='list', requires=())
+
+
+class ConcurrentTransactionTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def test_pieces_run_in_the_request_transaction(self):
+        from mock import patch
+        view = ConcurrentObjectsView(mode='detail')
+        view.request = RequestFactory().get('/')
+        with patch('jigsawview.views.get_executor') as get_executor:
+            context = view.get_context_data(view.request, pk=1)
+        self.assertFalse(get_executor.called)
+        self.assertEqual(context['obj'].slug, 'object_1')
+        self.assertEqual(len(context['other_list']), 2)
+        self.assertEqual(
+            sorted(m.piece for m in view.instrumentation.measures),
+            ['obj', 'other'])
+
+
+class CachedObjectPiece(MyObjectPiece):
+    cache_timeout = 60
+
+
+class UnpicklablePiece(Piece):
+    cache_timeout = 60
+
+    def get_context_data(self, context, *args, **kwargs):
+        context['unpicklable'] = lambda: 42
+        return context
+
+
+class CachedObjectView(JigsawView):
+    obj = CachedObjectPiece()
+    unpicklable = UnpicklablePiece()
+
+
+class PieceCacheTest(TestCase):
+
+    fixtures = ['object_piece.json']
+    urls = 'jigsawview.tests.urls'
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def get_context(self, mode, path='/', method='get', **kwargs):
+        request = getattr(RequestFactory(), method)(path)
+        response = CachedObjectView.as_view(mode=mode)(request, **kwargs)
+        return getattr(response, 'context_data', None)
+
+    def test_detail_is_cached(self):
+        self.assertEqual(self.get_context('detail', pk=1)['obj'].slug,
+            'object_1')
+        with self.assertNumQueries(0):
+            context = self.get_context('detail', pk=1)
+        self.assertEqual(context['obj'].slug, 'object_1')
+        self.assertEqual(context['unpicklable'](), 42)
+
+    def test_key_depends_on_url_kwargs_and_mode(self):
+        self.get_context('detail', pk=1)
+        self.assertEqual(self.get_context('detail', pk=2)['obj'].pk, 2)
+        self.assertTrue('obj_list' in self.get_context('list'))
+
+    def test_paginated_list_is_cached(self):
+        CachedObjectPiece.paginate_by = 1
+        try:
+            context = self.get_context('list', '/?page=2')
+            self.assertEqual([o.pk for o in context['obj_list']], [2])
+            with self.assertNumQueries(0):
+                context = self.get_context('list', '/?page=2')
+                self.assertEqual([o.pk for o in context['obj_list']], [2])
+                self.assertEqual(context['obj_paginator'].count, 2)
+            context = self.get_context('list', '/?page=1')
+            self.assertEqual([o.pk for o in context['obj_list']], [1])
+        finally:
+            del CachedObjectPiece.paginate_by
+
+    def test_keyset_cursor_is_part_of_the_key(self):
+        CachedObjectPiece.paginate_by = 1
+        CachedObjectPiece.pagination = 'keyset'
+        try:
+            context = self.get_context('list', '/?page=1')
+            self.assertEqual([o.pk for o in context['obj_list']], [1])
+            cursor = context['obj_page_obj'].next_page_number()
+            context = self.get_context('list', '/?page=%s' % cursor)
+            self.assertEqual([o.pk for o in context['obj_list']], [2])
+        finally:
+            del CachedObjectPiece.paginate_by
+            del CachedObjectPiece.pagination
+
+    def test_saving_invalidates_the_cache(self):
+        self.get_context('detail', pk=1)
+        request = RequestFactory().post('/object/1/update/', {
+            'slug': 'new_slug', 'other_slug_field': 'other'})
+        response = CachedObjectView.as_view(mode='update')(request, pk=1)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_context('detail', pk=1)['obj'].slug,
+            'new_slug')
+
+    def test_post_requests_are_not_cached(self):
+        piece = CachedObjectPiece(bound=True, mode='detail')
+        piece.add_kwargs(request=RequestFactory().post('/'))
+        self.assertFalse(piece.is_cacheable())
+        piece.add_kwargs(request=RequestFactory().get('/'))
+        self.assertTrue(piece.is_cacheable())
+        piece.mode = 'update'
+        self.assertFalse(piece.is_cacheable())
+
+
+class DatedPiece(ObjectPiece):
+    model = MyDatedModel
+    last_modified_field = 'updated_at'
+
+
+class DatedView(JigsawView):
+    conditional_response = True
+    dated = DatedPiece()
+
+
+class CachedDatedView(DatedView):
+    response_cache_timeout = 60
+
+
+class UndatedView(DatedView):
+    template_name = 'tests/dated_detail.html'
+    piece1 = MyPiece1()
+
+
+class PrivateDatedView(CachedDatedView):
+    def render_to_response(self, request, context, **response_kwargs):
+        response = super(PrivateDatedView, self).render_to_response(
+            request, context, **response_kwargs)
+        response['X-Dated'] = 'yes'
+        if request.GET.get('cookie'):
+            response.set_cookie('private', 'yes')
+        return response
+
+
+class DayPiece(Piece):
+    def get_validator(self, **kwargs):
+        return (datetime.date(2013, 1, 3), 'day')
+
+
+class TimePiece(Piece):
+    def get_validator(self, **kwargs):
+        return (datetime.datetime(2013, 1, 2, 3, 4, 5), 'time')
+
+
+class MixedDatesView(JigsawView):
+    day = DayPiece()
+    time = TimePiece()
+
+
+class ConditionalResponseTest(TestCase):
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.obj = MyDatedModel.objects.create(name='first',
+            updated_at=datetime.datetime(2013, 1, 2, 3, 4, 5))
+
+    def get(self, view=DatedView, mode='detail', headers=None, **kwargs):
+        if mode == 'detail':
+            kwargs.setdefault('pk', self.obj.pk)
+        request = RequestFactory().get('/dated/', **(headers or {}))
+        response = view.as_view(mode=mode)(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def test_validators_headers(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Last-Modified'],
+            'Wed, 02 Jan 2013 03:04:05 GMT')
+        self.assertTrue(response['ETag'])
+        self.assertEqual(self.get(mode='list')['Last-Modified'],
+            'Wed, 02 Jan 2013 03:04:05 GMT')
+
+    def test_not_modified(self):
+        etag = self.get()['ETag']
+        with self.assertNumQueries(1):
+            response = self.get(headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.get(headers={
+            'HTTP_IF_MODIFIED_SINCE': 'Wed, 02 Jan 2013 03:04:05 GMT'})
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_responses_are_measured(self):
+        view = type(str('InstrumentedDatedView'), (DatedView,),
+            {'server_timing': True})
+        etag = self.get(view=view)['ETag']
+        response = self.get(view=view, headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertTrue('add_kwargs;dur=' in response['Server-Timing'])
+
+    def test_modified(self):
+        etag = self.get()['ETag']
+        self.obj.updated_at = datetime.datetime(2013, 1, 3)
+        self.obj.save()
+        response = self.get(headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_depends_on_count(self):
+        etag = self.get(mode='list')['ETag']
+        MyDatedModel.objects.create(name='second',
+            updated_at=datetime.datetime(2012, 1, 1))
+        response = self.get(mode='list', headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.strip(), b'first second')
+
+    def test_pieces_without_validator(self):
+        response = self.get(view=UndatedView)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_response_cache(self):
+        response = self.get(view=CachedDatedView)
+        self.assertEqual(response.content.strip(), b'first')
+        with self.assertNumQueries(1):
+            response = self.get(view=CachedDatedView)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.strip(), b'first')
+        self.assertEqual(response['Last-Modified'],
+            'Wed, 02 Jan 2013 03:04:05 GMT')
+
+    def test_response_cache_keeps_the_headers(self):
+        self.get(view=PrivateDatedView)
+        with self.assertNumQueries(1):
+            response = self.get(view=PrivateDatedView)
+        self.assertEqual(response['X-Dated'], 'yes')
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+    def test_private_responses_are_not_cached(self):
+        def get(view=PrivateDatedView, path='/dated/', session=None):
+            request = RequestFactory().get(path)
+            if session is not None:
+                request.session = session
+            return view.as_view(mode='detail')(request,
+                pk=self.obj.pk).render()
+
+        get(path='/dated/?cookie=1')
+        with self.assertNumQueries(2):
+            get(path='/dated/?cookie=1')
+        get(session=Mock(accessed=True))
+        with self.assertNumQueries(2):
+            get(session=Mock(accessed=True))
+
+    def test_validators_of_dates_and_datetimes(self):
+        import calendar
+        view = MixedDatesView(mode='detail')
+        etag, last_modified = view.get_validators(RequestFactory().get('/'))
+        self.assertEqual(last_modified,
+            calendar.timegm((2013, 1, 3, 0, 0, 0)))
+
+
+class SharedObjectView(JigsawView):
+    obj = MyObjectPiece()
+    same_obj = MyObjectPiece()
+
+
+class ScopedObjectView(SharedObjectView):
+    scoped_obj = MyObjectPiece(model=None,
+        queryset=MyObjectModel.objects.filter(slug='object_2'))
+
+
+class RelatedObjectView(JigsawView):
+    inline = ObjectPiece(model=MyInlineModel, pk_url_kwarg='inline_pk')
+    obj = MyObjectPiece()
+
+
+class AnnotatedObjectView(SharedObjectView):
+    annotated_obj = MyObjectPiece(model=None,
+        queryset=MyObjectModel.objects.annotate(inlines=Count('myinlinemodel')))
+
+
+class HeaderUpdateView(JigsawView):
+    header = MyObjectPiece(mode='detail')
+    obj = MyObjectPiece()
+
+
+class IdentityMapTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def get_context(self, view, **kwargs):
+        request = RequestFactory().get('/')
+        return view.as_view(mode='detail')(request, **kwargs).context_data
+
+    def test_same_lookups_share_the_object(self):
+        with self.assertNumQueries(1):
+            context = self.get_context(SharedObjectView, pk=1)
+        self.assertTrue(context['obj'] is context['same_obj'])
+
+    def test_lookups_keep_their_scope(self):
+        from django.http import Http404
+        self.assertRaises(Http404, self.get_context, ScopedObjectView, pk=1)
+        context = self.get_context(ScopedObjectView, pk=2)
+        self.assertEqual(context['obj'], context['scoped_obj'])
+        self.assertTrue(context['obj'] is not context['scoped_obj'])
+
+    def test_annotated_lookups_keep_their_instance(self):
+        context = self.get_context(AnnotatedObjectView, pk=1)
+        self.assertEqual(context['annotated_obj'].inlines, 1)
+
+    def test_updated_object_isnt_shared(self):
+        request = RequestFactory().post('/', {'slug': 'EDITED'})
+        response = HeaderUpdateView.as_view(mode='update')(request, pk=1)
+        context = response.context_data
+        self.assertFalse(context['obj_form'].is_valid())
+        self.assertEqual(context['obj_form'].instance.slug, 'EDITED')
+        self.assertEqual(context['header'].slug, 'object_1')
+
+    def test_concurrent_adds(self):
+        import threading
+        from jigsawview.identity import IdentityMap
+        identity_map = IdentityMap()
+        errors = []
+
+        def add(start):
+            try:
+                for pk in range(start, start + 50):
+                    identity_map.add(MyInlineModel(pk=pk, root_obj_id=1))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=add, args=(i * 50,))
+            for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(identity_map), 200)
+
+    def test_related_objects_are_shared(self):
+        with self.assertNumQueries(2):
+            context = self.get_context(RelatedObjectView, pk=1, inline_pk=1)
+            self.assertTrue(context['inline'].root_obj is context['obj'])
+
+    def test_get(self):
+        view = SharedObjectView(mode='detail')
+        obj = MyObjectModel.objects.get(pk=1)
+        view.identity_map.add(obj)
+        self.assertTrue(obj in view.identity_map)
+        self.assertTrue(view.identity_map.get(MyObjectModel, '1') is obj)
+        self.assertEqual(view.identity_map.get(MyObjectModel, 2), None)
+        self.assertEqual(view.identity_map.get(MyObjectModel, 'a'), None)
+
+
+class ChainedObjectView(JigsawView):
+    obj = MyObjectPiece()
+    inline = ObjectPiece(model=MyInlineModel, pk_url_kwarg='inline_pk',
+        parent='obj', parent_field='root_obj')
+
+
+class ScopedChainedObjectView(ChainedObjectView):
+    obj = MyObjectPiece(model=None,
+        queryset=MyObjectModel.objects.filter(slug='object_2'))
+
+
+class ChainedListView(JigsawView):
+    obj = MyObjectPiece(default_mode='detail')
+    inline = ObjectPiece(model=MyInlineModel, mode='list', requires=(),
+        parent='obj', parent_field='root_obj')
+
+
+class BranchedObjectView(ChainedObjectView):
+    other_inline = ObjectPiece(model=MyInlineModel,
+        pk_url_kwarg='other_inline_pk', parent='obj', parent_field='root_obj')
+
+
+class WrongParentView(JigsawView):
+    obj = MyOtherObjectPiece()
+    inline = ObjectPiece(model=MyInlineModel, pk_url_kwarg='inline_pk',
+        parent='obj', parent_field='root_obj')
+
+
+class WrongParentListView(JigsawView):
+    obj = MyOtherObjectPiece(mode='detail')
+    inline = ObjectPiece(model=MyInlineModel, mode='list',
+        parent='obj', parent_field='root_obj')
+
+
+class ChildView(ChainedObjectView):
+    piece1 = MyPiece1()
+
+
+class GrandChildView(ChildView):
+    piece2 = MyPiece2()
+
+
+class ParentPieceTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def get_context(self, view, mode='detail', **kwargs):
+        request = RequestFactory().get('/')
+        return view.as_view(mode=mode)(request, **kwargs).context_data
+
+    def test_objects_are_fetched_in_one_query(self):
+        with self.assertNumQueries(1):
+            context = self.get_context(ChainedObjectView, pk=1, inline_pk=1)
+            self.assertTrue(context['inline'].root_obj is context['obj'])
+        self.assertEqual(context['obj'].pk, 1)
+
+    def test_object_outside_of_its_parent(self):
+        from django.http import Http404
+        self.assertRaises(Http404, self.get_context, ChainedObjectView,
+            pk=2, inline_pk=1)
+
+    def test_updated_objects_are_fetched_on_their_own(self):
+        from django.http import Http404
+        self.assertRaises(Http404, self.get_context, ChainedObjectView,
+            mode='update', pk=2, inline_pk=1)
+        context = self.get_context(ChainedObjectView, mode='update',
+            pk=1, inline_pk=1)
+        self.assertEqual(context['inline'].root_obj, context['obj'])
+        self.assertTrue(context['inline'].root_obj is not context['obj'])
+
+    def test_parent_queryset_is_checked(self):
+        from django.http import Http404
+        MyInlineModel.objects.create(root_obj_id=2, my_data='querty')
+        self.assertRaises(Http404, self.get_context, ScopedChainedObjectView,
+            pk=1, inline_pk=1)
+        context = self.get_context(ScopedChainedObjectView, pk=2, inline_pk=2)
+        self.assertEqual(context['obj'].pk, 2)
+
+    def test_lists_are_limited_to_the_parent_object(self):
+        with self.assertNumQueries(2):
+            context = self.get_context(ChainedListView, pk=1)
+            self.assertEqual([o.pk for o in context['inline_list']], [1])
+        context = self.get_context(ChainedListView, pk=2)
+        self.assertEqual(list(context['inline_list']), [])
+
+    def test_branches_share_their_parent(self):
+        from django.http import Http404
+        MyInlineModel.objects.create(root_obj_id=1, my_data='qwerty')
+        other = MyInlineModel.objects.create(root_obj_id=2, my_data='qwerty')
+        with self.assertNumQueries(2):
+            context = self.get_context(BranchedObjectView, pk=1,
+                inline_pk=1, other_inline_pk=2)
+        self.assertTrue(context['inline'].root_obj is context['obj'])
+        self.assertTrue(context['other_inline'].root_obj is context['obj'])
+        self.assertRaises(Http404, self.get_context, BranchedObjectView,
+            pk=1, inline_pk=1, other_inline_pk=other.pk)
+
+    def test_parent_field_points_to_the_parent_model(self):
+        from django.core.exceptions import ImproperlyConfigured
+        self.assertRaises(ImproperlyConfigured, self.get_context,
+            WrongParentView, pk=3, inline_pk=1)
+        self.assertRaises(ImproperlyConfigured, self.get_context,
+            WrongParentListView, mode='list', pk=3)
+
+    def test_parents_are_inherited(self):
+        self.assertEqual(list(GrandChildView.pieces.keys()),
+            ['obj', 'inline', 'piece1', 'piece2'])
+        self.assertEqual(GrandChildView.execution_plan.parents,
+            {'inline': 'obj'})
+
+    def test_unknown_parent(self):
+        from django.core.exceptions import ImproperlyConfigured
+        with self.assertRaises(ImproperlyConfigured):
+            class UnknownParentView(JigsawView):
+                inline = ObjectPiece(model=MyInlineModel, parent='obj',
+                    parent_field='root_obj')
+
+
+class InstrumentedView(ObjectView):
+    server_timing = True
+
+
+class BudgetView(ObjectView):
+    query_budget = 0
+    query_budget_action = 'raise'
+    other = MyOtherObjectPiece(mode='list', query_budget=1)
+
+
+class InstrumentationTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def get(self, view=InstrumentedView, **kwargs):
+        request = RequestFactory().get('/object/1/')
+        return view.as_view(mode='detail', **kwargs)(request, pk=1).render()
+
+    def test_measures(self):
+        from jigsawview.instrumentation import request_measured
+        received = []
+
+        def receiver(sender, view, request, response, measures, **kwargs):
+            received.append((sender, measures))
+
+        request_measured.connect(receiver)
+        try:
+            self.get()
+        finally:
+            request_measured.disconnect(receiver)
+        self.assertEqual(len(received), 1)
+        sender, measures = received[0]
+        self.assertEqual(sender, InstrumentedView)
+        self.assertEqual(
+            [(m.piece, m.phase, m.queries) for m in measures], [
+                ('obj', 'add_kwargs', 0),
+                ('other', 'add_kwargs', 0),
+                ('other', 'context', 0),
+                ('obj', 'context', 1),
+                ('obj', 'dispatch', 0),
+                ('other', 'dispatch', 0),
+                (None, 'render', 0),
+            ])
+
+    def test_responses_stay_lazy(self):
+        import pickle
+        from jigsawview.instrumentation import request_measured
+        received = []
+
+        def receiver(sender, measures, **kwargs):
+            received.append([m.phase for m in measures])
+
+        request = RequestFactory().get('/object/1/')
+        request_measured.connect(receiver)
+        try:
+            response = InstrumentedView.as_view(mode='detail')(request, pk=1)
+            self.assertFalse(response.is_rendered)
+            self.assertEqual(received, [])
+            response.template_name = 'tests/obj_detail.html'
+            response = response.render()
+        finally:
+            request_measured.disconnect(receiver)
+        self.assertEqual(received[0][-1], 'render')
+        self.assertTrue('render;dur=' in response['Server-Timing'])
+        self.assertEqual(pickle.loads(pickle.dumps(response)).content,
+            response.content)
+
+    def test_views_without_instrumentation_are_not_measured(self):
+        view = ObjectView(mode='detail')
+        view.measure = Mock(side_effect=AssertionError)
+        view.report_measures = Mock(side_effect=AssertionError)
+        response = view.dispatch(RequestFactory().get('/object/1/'), pk=1)
+        self.assertEqual(response.context_data['obj'].pk, 1)
+
+    def test_server_timing(self):
+        response = self.get()
+        self.assertTrue('obj.context;dur=' in response['Server-Timing'])
+        self.assertTrue('desc="1 queries"' in response['Server-Timing'])
+        self.assertFalse(self.get(view=ObjectView).has_header(
+            'Server-Timing'))
+
+    def test_query_budget(self):
+        from jigsawview.instrumentation import QueryBudgetExceeded
+        self.assertRaises(QueryBudgetExceeded, self.get, view=BudgetView)
+        self.assertEqual(self.get(view=BudgetView, query_budget=1)
+            .status_code, 200)
+
+    def test_query_budget_logging(self):
+        from mock import patch
+        with patch('jigsawview.instrumentation.logger') as logger:
+            response = self.get(view=BudgetView, query_budget_action='log')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(logger.warning.call_count, 1)
+
+
+class FormsetView(JigsawView):
+    template_name = 'tests/obj_list.html'
+    objs = MyFormsetPiece()
+
+
+class FilteredListView(JigsawView):
+    obj = FilterPiece(paginate_by=5)
+
+
+class NPlusOnePiece(Piece):
+
+    def get_context_data(self, context, *args, **kwargs):
+        context['inlines'] = [o.root_obj.slug
+            for o in MyInlineModel.objects.all()]
+        return context
+
+
+class NPlusOneView(JigsawView):
+    template_name = 'tests/obj_list.html'
+    inlines = NPlusOnePiece()
+
+
+class QueryCountTest(QueryCountTestMixin, TestCase):
+
+    fixtures = ['object_piece.json']
+    urls = 'jigsawview.tests.urls'
+
+    def create_rows(self, size):
+        for i in range(MyObjectModel.objects.count(), size):
+            MyObjectModel.objects.create(slug='object_%i' % (i + 1),
+                other_slug_field='other_object_%i' % (i + 1))
+            MyInlineModel.objects.create(root_obj_id=1, my_data='%i' % i)
+            MyOtherObjectModel.objects.create()
+
+    def test_object_piece(self):
+        self.assertEqual(self.assertModesConstantQueries(ObjectView,
+            self.create_rows, object_kwargs={'pk': 1}), {
+                'list': 2, 'detail': 2, 'update': 2, 'new': 1, 'delete': 2})
+
+    def test_inline_formset_piece(self):
+        from jigsawview.tests.views import InlineObjectView
+        self.assertEqual(self.assertModesConstantQueries(InlineObjectView,
+            self.create_rows, modes=('detail', 'update', 'new'),
+            object_kwargs={'pk': 1}), {'detail': 1, 'update': 2, 'new': 0})
+
+    def test_model_formset_piece(self):
+        self.assertEqual(self.assertConstantQueries(
+            FormsetView.as_view(mode='list'), self.create_rows), 1)
+
+    def test_filtered_list(self):
+        self.assertEqual(self.assertConstantQueries(
+            FilteredListView.as_view(mode='list'), self.create_rows,
+            data={'slug': 'object_1'}), 2)
+
+    def test_n_plus_one_queries_fail(self):
+        self.assertRaises(AssertionError, self.assertConstantQueries,
+            NPlusOneView.as_view(mode='list'), self.create_rows)
+
+
+class CountingPiece(MyObjectPiece):
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        super(CountingPiece, self).__init__(*args, **kwargs)
+        CountingPiece.instances.append(self)
+
+
+class ReusableView(JigsawView):
+    obj = CountingPiece()
+
+
+class ReusableChainedView(ReusableView):
+    inline = ObjectPiece(model=MyInlineModel, pk_url_kwarg='inline_pk',
+        parent='obj', parent_field='root_obj')
+
+
+class ReusableViewTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def setUp(self):
+        CountingPiece.instances = []
+
+    def test_pieces_are_built_once(self):
+        view = ReusableView.as_view(mode='detail', reusable=True)
+        self.assertEqual(len(CountingPiece.instances), 1)
+        for pk in (1, 2):
+            response = view(RequestFactory().get('/'), pk=pk)
+            self.assertEqual(response.context_data['obj'].pk, pk)
+        self.assertEqual(len(CountingPiece.instances), 1)
+
+    def test_request_state(self):
+        prototype = ReusableChainedView(mode='detail', reusable=True)
+        request = RequestFactory().get('/')
+        view = prototype.for_request(request, pk=1, inline_pk=1)
+        other = prototype.for_request(request, pk=2)
+        self.assertTrue(view.identity_map is not other.identity_map)
+        self.assertTrue(view.request is request)
+        self.assertEqual(view.kwargs, {'pk': 1, 'inline_pk': 1})
+        self.assertTrue(view.obj is not prototype.obj)
+        self.assertTrue(view.obj.view is view)
+        self.assertTrue(view._context_pieces[0].view is view)
+        self.assertTrue(view.obj._inlines is not prototype.obj._inlines)
+
+        response = view.dispatch(request, pk=1, inline_pk=1)
+        context = response.context_data
+        self.assertTrue(context['inline'].root_obj is context['obj'])
+        self.assertTrue(context['obj'] in view.identity_map)
+        self.assertEqual(len(other.identity_map), 0)
+        self.assertEqual(len(prototype.identity_map), 0)
+        self.assertEqual(prototype.context, {})
+        self.assertFalse(hasattr(prototype.obj, 'object'))
+
+    def test_request_state_is_created_on_first_use(self):
+        view = ObjectView(mode='list')
+        view.dispatch(RequestFactory().get('/'))
+        self.assertEqual(view.state, None)
+        view = ObjectView(mode='detail')
+        view.dispatch(RequestFactory().get('/'), pk=1)
+        self.assertTrue(view.state is not None)
+
+
+class TitlePiece(Piece):
+    def get_context_data(self, context, *args, **kwargs):
+        context['title'] = 'Objects'
+        return context
+
+
+class StreamingView(JigsawView):
+    title = TitlePiece()
+    obj = MyObjectPiece(streaming=True, paginate_by=1, streaming_chunk_size=1)
+
+
+class StreamingTest(TestCase):
+
+    fixtures = ['object_piece.json']
+
+    def get_response(self, path):
+        request = RequestFactory().get(path)
+        return StreamingView.as_view(mode='list')(request)
+
+    def test_all_objects_are_streamed(self):
+        from django.http import StreamingHttpResponse
+        response = self.get_response('/?page=all')
+        self.assertTrue(isinstance(response, StreamingHttpResponse))
+        with self.assertNumQueries(1):
+            chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(b''.join(chunks),
+            b'<ul title="Objects"><li>object_1</li><li>object_2</li></ul>')
+
+    def test_streaming_requires_django_1_5(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from jigsawview.pieces import object as object_module
+        streaming_response = object_module.StreamingHttpResponse
+        object_module.StreamingHttpResponse = None
+        try:
+            self.assertRaises(ImproperlyConfigured, self.get_response,
+                '/?page=all')
+        finally:
+            object_module.StreamingHttpResponse = streaming_response
+
+    def test_pages_are_not_streamed(self):
+        response = self.get_response('/?page=2')
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.template_name, 'tests/obj_list.html')
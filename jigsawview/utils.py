@@ -0,0 +1,105 @@
+"""
+Utilities shared by the jigsawview views and pieces.
+"""
+
+from __future__ import unicode_literals
+
+import threading
+
+from django.db import transaction
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from django.utils.datastructures import SortedDict as OrderedDict
+
+
+def atomic(using=None):
+    """
+    Returns a context manager running its block in a single transaction.
+    """
+    if hasattr(transaction, 'atomic'):
+        return transaction.atomic(using=using)
+    return transaction.commit_on_success(using=using)
+
+
+def uses_default(cls, method_name, base):
+    """
+    Returns whether cls doesn't override base's method.
+    """
+    method = getattr(cls, method_name)
+    default = getattr(base, method_name)
+    return getattr(method, '__func__', method) is \
+        getattr(default, '__func__', default)
+
+
+def make_key(*parts):
+    """
+    Returns a hashable version of the given parts so they can be used as a
+    cache key. Lists, tuples, sets and dicts are frozen recursively.
+    """
+    return tuple(_freeze(part) for part in parts)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted(
+            (k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    return value
+
+
+class ClassCache(object):
+    """
+    A process wide and thread safe cache for dynamically generated classes.
+    When maxsize is set, the least recently used classes are evicted once
+    the cache is full.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._classes = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, factory, *args, **kwargs):
+        """
+        Returns the class stored under key, calling factory with the
+        remaining arguments to build it on a miss.
+        Unhashable keys are not cached.
+        """
+        if self.maxsize is None:
+            try:
+                return self._classes[key]
+            except KeyError:
+                pass
+            except TypeError:
+                return factory(*args, **kwargs)
+        else:
+            try:
+                hash(key)
+            except TypeError:
+                return factory(*args, **kwargs)
+        with self._lock:
+            if key in self._classes:
+                value = self._classes[key]
+                if self.maxsize is not None:
+                    # Move the key at the end of the eviction order
+                    del self._classes[key]
+                    self._classes[key] = value
+                return value
+            value = factory(*args, **kwargs)
+            self._classes[key] = value
+            if self.maxsize is not None:
+                while len(self._classes) > self.maxsize:
+                    del self._classes[next(iter(self._classes))]
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._classes.clear()
+
+    def __len__(self):
+        return len(self._classes)
@@ -5,18 +5,36 @@ from __future__ import unicode_literals
 
 import six
 import copy
+import calendar
+import datetime
+import hashlib
 
 from functools import update_wrapper
 
-from django.utils.datastructures import SortedDict
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, HttpResponseNotModified
 from django.utils.decorators import classonlymethod
+from django.utils.http import (http_date, parse_http_date_safe, parse_etags,
+    quote_etag)
 from django.template.response import TemplateResponse
 
 from jigsawview.pieces import UnboundPiece
+from jigsawview.lazy import LazyContext
+from jigsawview.graph import (build_dependencies, sort_dependencies,
+    get_levels)
+from jigsawview.concurrency import get_executor, in_transaction, run_in_thread
+from jigsawview.cache import get_cache, get_request_attribute
+from jigsawview.instrumentation import (Instrumentation, no_measurement,
+    request_measured)
+from jigsawview.state import RequestState, creation_lock, state_attribute
 
-# Monkey patch SortedDict to work with copy
-if not hasattr(SortedDict, '__copy__'):
-    SortedDict.__copy__ = SortedDict.copy
+try:
+    from django.utils.datastructures import SortedDict
+    # Monkey patch SortedDict to work with copy
+    if not hasattr(SortedDict, '__copy__'):
+        SortedDict.__copy__ = SortedDict.copy
+except ImportError:  # Django >= 1.9
+    from collections import OrderedDict as SortedDict
 
 
 def get_declared_pieces(bases, attrs):
@@ -33,12 +51,123 @@ def get_declared_pieces(bases, attrs):
     # Note that we loop over the bases in *reverse*. This is necessary in
     # order to preserve the correct order of fields.
     for base in bases[::-1]:
-        if hasattr(base, 'base_pieces'):
-            pieces = list(base.base_pieces.items()) + pieces
+        if hasattr(base, 'pieces'):
+            pieces = list(base.pieces.items()) + pieces
 
     return SortedDict(pieces)
 
 
+def merge_contexts(snapshot, results):
+    """
+    Returns a copy of the snapshot updated with the values each result
+    added or changed, in the results order.
+    """
+    context = dict(snapshot)
+    for result in results:
+        for key, value in result.items():
+            if key not in snapshot or snapshot[key] is not value:
+                context[key] = value
+    return context
+
+
+def is_not_modified(request, etag, last_modified):
+    """
+    Returns whether the request's conditional headers match the validators.
+    last_modified is a timestamp or None.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        # Older Django versions return the etags unquoted
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags or quote_etag(etag) in etags
+    if_modified_since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return bool(if_modified_since and last_modified and
+        last_modified <= if_modified_since)
+
+
+def get_timestamp(value):
+    """
+    Returns the timestamp of a date or datetime, dates standing for their
+    midnight in UTC.
+    """
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    return calendar.timegm(value.utctimetuple())
+
+
+def is_shared_response(request, response):
+    """
+    Returns whether a rendered response can be served to any client. The
+    responses setting cookies, varying on them or built with the session or
+    the CSRF token belong to their client.
+    """
+    if response.cookies or request.META.get('CSRF_COOKIE_USED'):
+        return False
+    session = getattr(request, 'session', None)
+    if session is not None and getattr(session, 'accessed', False):
+        return False
+    vary = response.has_header('Vary') and response['Vary'] or ''
+    return 'cookie' not in vary.lower()
+
+
+class ExecutionPlan(object):
+    """
+    The pieces ordering of a view class, computed once when the class is
+    created so that requests only loop over tuples.
+    Orders are stored as indexes within the pieces declaration order.
+    The context is computed following the pieces dependencies.
+    """
+
+    def __init__(self, pieces):
+        self.piece_names = tuple(pieces.keys())
+        declaration = tuple(range(len(self.piece_names)))
+        self.dependencies = build_dependencies(pieces)
+        indexes = dict((name, i) for i, name in enumerate(self.piece_names))
+        order = sort_dependencies(self.dependencies)
+        self.kwargs_order = declaration[::-1]
+        self.context_order = tuple([indexes[name] for name in order])
+        # Groups of pieces which don't depend on each other
+        levels = get_levels(self.dependencies, order)
+        groups = {}
+        for name in order:
+            groups.setdefault(levels[name], []).append(indexes[name])
+        self.context_levels = tuple([tuple(groups[level])
+            for level in sorted(groups)])
+        self.dispatch_order = declaration[::-1]
+        self.template_order = declaration[::-1]
+        self.query_budgets = any(
+            getattr(unbound.bound_cls, 'query_budget', None) is not None
+            for unbound in pieces.values())
+        # Whether the context can be computed by calling each piece's
+        # get_context_data in turn, without lazy nor cached pieces
+        self.plain_context = not any(
+            getattr(unbound.bound_cls, 'lazy', False) or
+            getattr(unbound.bound_cls, 'cache_timeout', None) is not None
+            for unbound in pieces.values())
+        # Pieces whose object belongs to another piece's one
+        self.parents = {}
+        self.children = {}
+        for name, unbound in pieces.items():
+            parent = getattr(unbound.bound_cls, 'parent', None)
+            if not parent:
+                continue
+            if parent not in pieces or parent == name:
+                raise ImproperlyConfigured(
+                    "Piece '%s' has an unknown parent '%s'." % (name, parent))
+            if not getattr(unbound.bound_cls, 'parent_field', None):
+                raise ImproperlyConfigured(
+                    "Piece '%s' has a parent but no parent_field." % name)
+            self.parents[name] = parent
+            self.children.setdefault(parent, []).append(name)
+
+    def order(self, pieces, indexes):
+        """
+        Returns the pieces sorted according to indexes.
+        """
+        return tuple([pieces[i] for i in indexes])
+
+
 class ViewMetaclass(type):
     """
     A meta class the will gather the view's pieces
@@ -49,6 +178,7 @@ class ViewMetaclass(type):
         attrs['pieces'] = get_declared_pieces(bases, attrs)
         attrs['base_pieces'] = SortedDict([(k, v)
             for k, v in attrs['pieces'].items() if k in original_attrs])
+        attrs['execution_plan'] = ExecutionPlan(attrs['pieces'])
         new_class = super(ViewMetaclass, cls).__new__(cls, name, bases, attrs)
         return new_class
 
@@ -63,18 +193,100 @@ class JigsawView(six.with_metaclass(ViewMetaclass, object)):
     template_name = None
     template_name_prefix = None
 
+    concurrent_pieces = False
+    max_workers = 4
+
+    # Answer conditional GET requests from the pieces' validators
+    conditional_response = False
+    # Dotted request paths the response depends on besides the URL
+    validator_request_attributes = ()
+    # Seconds the rendered responses are cached for, keyed by their ETag
+    response_cache_timeout = None
+    response_cache_alias = 'default'
+    response_cache_key_prefix = 'jigsawview.response'
+
+    # Measure the pieces' phases, see jigsawview.instrumentation
+    instrument = False
+    server_timing = False
+    # Maximum number of queries per piece
+    query_budget = None
+    # 'raise' or 'log', None to raise in DEBUG mode only
+    query_budget_action = None
+
+    # Build the view and its pieces once and copy them for each request
+    reusable = False
+
+    # The objects shared by the pieces, see jigsawview.state
+    state = None
+    identity_map = state_attribute('identity_map')
+    chain_objects = state_attribute('chain_objects')
+
     def __init__(self, **kwargs):
         for k, v in kwargs.items():
             setattr(self, k, v)
         mode = kwargs['mode']
+        base_pieces = self.base_pieces
+        bound_pieces = []
         for name, unbound_piece in self.pieces.items():
             piece = unbound_piece(
                 view_mode=mode,
-                inherited_piece=(name not in self.base_pieces),
+                inherited_piece=(name not in base_pieces),
                 view_name=name,
                 view=self)
-            setattr(self, name, piece)
+            bound_pieces.append(piece)
+        self.set_pieces(bound_pieces)
         self.context = {}
+        self.instrumentation = self.get_instrumentation()
+
+    def set_pieces(self, bound_pieces):
+        """
+        Sets the bound pieces as attributes and in the execution orders.
+        """
+        plan = self.execution_plan
+        for piece in bound_pieces:
+            setattr(self, piece.view_name, piece)
+        self._pieces = tuple(bound_pieces)
+        self._kwargs_pieces = plan.order(bound_pieces, plan.kwargs_order)
+        self._context_pieces = plan.order(bound_pieces, plan.context_order)
+        self._dispatch_pieces = plan.order(bound_pieces, plan.dispatch_order)
+        self._template_pieces = plan.order(bound_pieces, plan.template_order)
+
+    def get_instrumentation(self):
+        """
+        Returns the Instrumentation of a request or None when the view isn't
+        instrumented.
+        """
+        if self.instrument or self.server_timing or \
+                self.query_budget is not None or \
+                self.execution_plan.query_budgets:
+            return Instrumentation(self)
+        return None
+
+    def get_request_state(self):
+        """
+        Returns the RequestState of the request, created on first use.
+        """
+        state = self.state
+        if state is None:
+            with creation_lock:
+                state = self.state
+                if state is None:
+                    state = self.state = RequestState()
+        return state
+
+    def for_request(self, request, *args, **kwargs):
+        """
+        Returns a copy of the view and its pieces for a request. The copies
+        share the configuration computed by __init__, the pieces resetting
+        their request attributes with reset_request_state.
+        """
+        view = self.__class__.__new__(self.__class__)
+        view.__dict__.update(self.__dict__)
+        view.request, view.args, view.kwargs = request, args, kwargs
+        view.context = {}
+        view.instrumentation = view.get_instrumentation()
+        view.set_pieces([piece.for_view(view) for piece in self._pieces])
+        return view
 
     def get_template_name(self):
         """
@@ -86,8 +298,7 @@ class JigsawView(six.with_metaclass(ViewMetaclass, object)):
         if self.template_name_prefix:
             return '%s%s.html' % (self.template_name_prefix, self.mode)
 
-        for piece_name in reversed(list(self.pieces.keys())):
-            piece = getattr(self, piece_name)
+        for piece in self._template_pieces:
             result = piece.get_template_name()
             if result:
                 return '%s.html' % result
@@ -98,17 +309,222 @@ class JigsawView(six.with_metaclass(ViewMetaclass, object)):
         """
         Returns all the aggregated contexes from the pieces.
         """
-        for piece_name in self.pieces.keys():
-            piece = getattr(self, piece_name)
-            self.context = piece.get_context_data(self.context, **kwargs)
+        # The pool threads wouldn't see the request's transaction
+        if self.concurrent_pieces and not in_transaction():
+            executor = get_executor(self.max_workers)
+            if executor is not None:
+                return self.get_concurrent_context_data(executor, **kwargs)
+        context = self.context
+        if self.execution_plan.plain_context and self.instrumentation is None:
+            for piece in self._context_pieces:
+                context = piece.get_context_data(context, **kwargs)
+        else:
+            for piece in self._context_pieces:
+                context = self.get_piece_context_data(piece, context, kwargs)
+        self.context = context
+        return context
+
+    def get_piece_context_data(self, piece, context, kwargs):
+        """
+        Returns the context updated by a single piece.
+        """
+        if piece.lazy:
+            return self.get_lazy_context_data(piece, context, kwargs)
+        with self.measure(piece, 'context'):
+            if piece.is_cacheable():
+                return piece.get_cached_context_data(context, **kwargs)
+            return piece.get_context_data(context, **kwargs)
+
+    def get_concurrent_context_data(self, executor, **kwargs):
+        """
+        Computes the context of the pieces which don't depend on each other
+        within the executor's threads.
+
+        Each piece gets a copy of the context computed by the pieces it
+        depends on. The values a piece adds or changes are then merged in the
+        context following the declaration order. Lazy pieces stay in the
+        request's thread.
+        """
+        for level in self.execution_plan.context_levels:
+            pieces = [self._pieces[i] for i in level]
+            if len([piece for piece in pieces if not piece.lazy]) < 2:
+                for piece in pieces:
+                    self.context = self.get_piece_context_data(
+                        piece, self.context, kwargs)
+                continue
+
+            snapshot = self.context
+            jobs = []
+            for piece in pieces:
+                if piece.lazy:
+                    jobs.append((None, self.get_piece_context_data(
+                        piece, dict(snapshot), kwargs)))
+                else:
+                    jobs.append((executor.submit(run_in_thread,
+                        self.get_piece_context_data,
+                        piece, dict(snapshot), kwargs), None))
+
+            results = []
+            for future, result in jobs:
+                if future is not None:
+                    result = future.result()
+                results.append(result)
+            self.context = merge_contexts(snapshot, results)
         return self.context
 
+    def measure(self, piece, phase):
+        """
+        Returns a context manager measuring a phase of a piece when the
+        view is instrumented.
+        """
+        if self.instrumentation is None:
+            return no_measurement
+        return self.instrumentation.measure(piece, phase)
+
+    def report_measures(self, request, response):
+        """
+        Sends the request_measured signal and sets the Server-Timing header
+        once the response is rendered. The template responses stay lazy:
+        their rendering is measured when the handler renders them, after
+        the template response middlewares.
+        """
+        if self.instrumentation is None:
+            return response
+        if not getattr(response, 'is_rendered', True):
+            render = response.render
+
+            def measured_render():
+                # Removed so that the rendered response can be pickled
+                del response.render
+                with self.measure(None, 'render'):
+                    rendered = render()
+                return self.send_measures(request, rendered)
+
+            response.render = measured_render
+            return response
+        return self.send_measures(request, response)
+
+    def send_measures(self, request, response):
+        """
+        Sends the request_measured signal and sets the Server-Timing header.
+        """
+        instrumentation = self.instrumentation
+        request_measured.send(sender=self.__class__, view=self,
+            request=request, response=response,
+            measures=instrumentation.measures)
+        if self.server_timing:
+            response['Server-Timing'] = instrumentation.get_server_timing()
+        return response
+
+    def get_lazy_context_data(self, piece, context, kwargs):
+        """
+        Adds a lazy piece's values to the context. The piece only computes
+        them when one of them is used.
+        """
+        if piece.get_context_names() is None:
+            raise ImproperlyConfigured(
+                "%s can't be lazy as it doesn't define the context names it "
+                "provides with get_context_names()." % piece.__class__.__name__)
+        return LazyContext(piece, context, kwargs).contribute(context)
+
+    def get_validators(self, request, **kwargs):
+        """
+        Returns the (etag, last_modified) validators of the response built
+        from the pieces' ones, or None when a piece can't provide one.
+        last_modified is a timestamp, None unless every piece provides a
+        modification date.
+        """
+        parts = ['%s.%s' % (self.__module__, self.__class__.__name__),
+            self.mode, request.get_full_path()]
+        for path in self.validator_request_attributes:
+            parts.append((path, get_request_attribute(request, path)))
+        dates = []
+        for piece in self._pieces:
+            validator = piece.get_validator(**kwargs)
+            if validator is None:
+                return None
+            last_modified, etag = validator
+            dates.append(last_modified)
+            parts.append(etag)
+        etag = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+        last_modified = None
+        if dates and None not in dates:
+            last_modified = max(get_timestamp(date) for date in dates)
+        return etag, last_modified
+
+    def get_response_cache_key(self, etag):
+        return '%s.%s' % (self.response_cache_key_prefix, etag)
+
+    def get_conditional_response(self, request, **kwargs):
+        """
+        Returns a (validators, response) tuple. The response is a 304 when
+        the client's copy is still valid, the cached response if any or
+        None when the response has to be built.
+        """
+        if not self.conditional_response or \
+                request.method not in ('GET', 'HEAD'):
+            return None, None
+        validators = self.get_validators(request, **kwargs)
+        if validators is None:
+            return None, None
+        etag, last_modified = validators
+        if is_not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+        elif self.response_cache_timeout is not None:
+            cached = get_cache(self.response_cache_alias).get(
+                self.get_response_cache_key(etag))
+            if cached is None:
+                return validators, None
+            content, headers = cached
+            response = HttpResponse(content)
+            for header, value in headers:
+                response[header] = value
+        else:
+            return validators, None
+        self.set_validator_headers(response, validators)
+        return validators, response
+
+    def set_validator_headers(self, response, validators):
+        """
+        Sets the ETag and Last-Modified headers from the validators.
+        """
+        etag, last_modified = validators
+        response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+
+    def finalize_response(self, response, validators):
+        """
+        Adds the validators to a rendered response and caches it with its
+        headers when response_cache_timeout is set, unless it belongs to the
+        client it's built for.
+        """
+        if validators is None or response.status_code != 200:
+            return response
+        self.set_validator_headers(response, validators)
+        if self.response_cache_timeout is not None:
+            key = self.get_response_cache_key(validators[0])
+            request = self.request
+
+            def cache_response(response):
+                if not is_shared_response(request, response):
+                    return
+                get_cache(self.response_cache_alias).set(key,
+                    (response.content, list(response.items())),
+                    self.response_cache_timeout)
+
+            if hasattr(response, 'add_post_render_callback') and \
+                    not response.is_rendered:
+                response.add_post_render_callback(cache_response)
+            else:
+                cache_response(response)
+        return response
+
     @classonlymethod
-    def as_view(cls, **initkwargs):
+    def check_initkwargs(cls, initkwargs):
         """
-        Main entry point for a request-response process.
+        Sanitizes the keyword arguments given to as_view.
         """
-        # sanitize keyword arguments
         for key in initkwargs:
             if key in cls.http_method_names:
                 raise TypeError("You tried to pass in the %s method name as a "
@@ -118,8 +534,29 @@ class JigsawView(six.with_metaclass(ViewMetaclass, object)):
                 raise TypeError("%s() received an invalid keyword %r" % (
                     cls.__name__, key))
 
+    @classonlymethod
+    def get_prototype(cls, initkwargs):
+        """
+        Returns the instance copied for each request by the reusable views
+        or None.
+        """
+        if not initkwargs.get('reusable', cls.reusable):
+            return None
+        return cls(**initkwargs)
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        """
+        Main entry point for a request-response process.
+        """
+        cls.check_initkwargs(initkwargs)
+        prototype = cls.get_prototype(initkwargs)
+
         def view(request, *args, **kwargs):
-            self = cls(**initkwargs)
+            if prototype is not None:
+                self = prototype.for_request(request, *args, **kwargs)
+            else:
+                self = cls(**initkwargs)
             return self.dispatch(request, *args, **kwargs)
 
         # take name and docstring from class
@@ -142,14 +579,42 @@ class JigsawView(six.with_metaclass(ViewMetaclass, object)):
         )
 
     def dispatch(self, request, *args, **kwargs):
-        for piece_name in reversed(list(self.pieces.keys())):
-            piece = getattr(self, piece_name)
+        self.request, self.args, self.kwargs = request, args, kwargs
+        if self.instrumentation is not None:
+            return self.measured_dispatch(request, *args, **kwargs)
+        for piece in self._kwargs_pieces:
             piece.add_kwargs(**kwargs)
             piece.add_kwargs(request=request)
+        validators, response = self.get_conditional_response(
+            request, **kwargs)
+        if response is not None:
+            return response
         context = self.get_context_data(request, **kwargs)
-        for piece_name in reversed(list(self.pieces.keys())):
-            piece = getattr(self, piece_name)
+        for piece in self._dispatch_pieces:
             result = piece.dispatch(context)
             if result:
                 return result
-        return self.render_to_response(request, context)
+        return self.finalize_response(
+            self.render_to_response(request, context), validators)
+
+    def measured_dispatch(self, request, *args, **kwargs):
+        """
+        The dispatch of the instrumented views, measuring each phase.
+        """
+        for piece in self._kwargs_pieces:
+            with self.measure(piece, 'add_kwargs'):
+                piece.add_kwargs(**kwargs)
+                piece.add_kwargs(request=request)
+        validators, response = self.get_conditional_response(
+            request, **kwargs)
+        if response is not None:
+            return self.report_measures(request, response)
+        context = self.get_context_data(request, **kwargs)
+        for piece in self._dispatch_pieces:
+            with self.measure(piece, 'dispatch'):
+                result = piece.dispatch(context)
+            if result:
+                return self.report_measures(request, result)
+        response = self.finalize_response(
+            self.render_to_response(request, context), validators)
+        return self.report_measures(request, response)
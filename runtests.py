@@ -2,6 +2,7 @@
 import sys
 from os.path import dirname, abspath
 
+import django
 from django.conf import settings
 
 if not settings.configured:
@@ -20,9 +21,22 @@ if not settings.configured:
         ],
         ROOT_URLCONF='',
         DEBUG=False,
+        # Django >= 3.2
+        DEFAULT_AUTO_FIELD='django.db.models.AutoField',
+        # Django >= 1.8
+        TEMPLATES=[{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'APP_DIRS': True,
+        }],
     )
 
-from django.test.simple import DjangoTestSuiteRunner
+if hasattr(django, 'setup'):  # Django >= 1.7
+    django.setup()
+
+try:
+    from django.test.simple import DjangoTestSuiteRunner
+except ImportError:  # Django >= 1.8
+    from django.test.runner import DiscoverRunner as DjangoTestSuiteRunner
 
 
 def runtests(*test_args):
@@ -38,4 +52,4 @@ def runtests(*test_args):
     sys.exit(failures)
 
 if __name__ == '__main__':
-    runtests()
+    runtests(*[arg for arg in sys.argv[1:] if not arg.startswith('-')])